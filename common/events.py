@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel carrying the events of all channels, as {"channel": ..., "data": ...}
+PG_CHANNEL = "events"
+LISTEN_RETRY_SECONDS = 5
+# Event streams send a comment this often to keep the connection open, and end after STREAM_SECONDS, as Django
+# doesn't notice a client disconnecting from a stream. Browsers' EventSource reconnects when a stream ends.
+HEARTBEAT_SECONDS = 20
+STREAM_SECONDS = 300
+
+
+class LocalBroker:
+    """
+    Delivers events published to a channel to the subscribers in this process, once the publishing transaction
+    commits. Subscribers are asyncio queues, so events can be published from any thread.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(dict)
+        self.lock = threading.Lock()
+
+    def publish(self, channel, data):
+        transaction.on_commit(lambda: self.send(channel, data))
+
+    def send(self, channel, data):
+        with self.lock:
+            subscribers = list(self.subscribers[channel].items())
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, data)
+
+    def subscribe(self, channel):
+        """Returns a queue receiving the data of events published to channel, until unsubscribed"""
+        queue = asyncio.Queue()
+        with self.lock:
+            self.subscribers[channel][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self.lock:
+            self.subscribers[channel].pop(queue, None)
+            if not self.subscribers[channel]:
+                del self.subscribers[channel]
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Publishes events with Postgres NOTIFY, which is sent on commit to every process. Each process listens on one
+    connection, in a thread started by its first subscriber, and sends the events to its own subscribers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def publish(self, channel, data):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [PG_CHANNEL, json.dumps({"channel": channel, "data": data})])
+
+    def subscribe(self, channel):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name="event-listener", daemon=True)
+                self.listener.start()
+        return super().subscribe(channel)
+
+    def listen(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Listening for events failed, reconnecting")
+                time.sleep(LISTEN_RETRY_SECONDS)
+
+    def _listen(self):
+        db = connections.create_connection("default")
+        try:
+            db.ensure_connection()
+            pg_connection = db.connection
+            with pg_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {PG_CHANNEL}")
+            while True:
+                if select.select([pg_connection], [], [], 60) == ([], [], []):
+                    continue
+                pg_connection.poll()
+                while pg_connection.notifies:
+                    event = json.loads(pg_connection.notifies.pop(0).payload)
+                    self.send(event["channel"], event["data"])
+        finally:
+            db.close()
+
+
+BROKERS = {
+    "local": LocalBroker,
+    "postgres": PostgresBroker,
+}
+
+
+@functools.cache
+def get_broker():
+    return BROKERS[settings.EVENT_BROKER]()
+
+
+def get_user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def get_game_channel(game_id):
+    return f"game:{game_id}"
+
+
+def format_event(data, event_id=None, event=None):
+    """Returns data as a server-sent event, with an optional id and event name"""
+    lines = [f"event: {event}"] if event else []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_events(channel, format_data, get_missed=None):
+    """
+    Yields the data published to channel as server-sent events formatted by format_data. Starts with the events
+    returned by get_missed, which is called after subscribing so that no event is lost in between.
+    """
+    broker = get_broker()
+    queue = broker.subscribe(channel)
+    try:
+        if get_missed:
+            for event in await sync_to_async(get_missed)():
+                yield event
+        end_time = time.monotonic() + STREAM_SECONDS
+        while (remaining := end_time - time.monotonic()) > 0:
+            try:
+                data = await asyncio.wait_for(queue.get(), min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                # Comments keep the connection open without triggering events
+                yield ": heartbeat\n\n"
+                continue
+            yield format_data(data)
+    finally:
+        broker.unsubscribe(channel, queue)
+
+
+def get_stream_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Don't let a proxy buffer the events
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -2,7 +2,6 @@ import uuid
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.db.models import Max
 
 from common.constants import NotificationType
 from common.managers import UserManager
@@ -49,13 +48,8 @@ class User(AbstractUser, TimestampedModel):
         return self.game_racks.filter(game__over=True, game__archived_on__isnull=True)
 
     def in_progress_games(self):
-        """Return in-progress games sorted by most recent turn or creation timestamp"""
-        racks = self.game_racks.select_related("game").filter(game__over=False)
-        return sorted(
-            racks,
-            key=lambda r: r.game.all_turns().aggregate(latest=Max("created_on"))["latest"] or r.game.created_on,
-            reverse=True
-        )
+        """Return in-progress games sorted by most recent activity"""
+        return self.game_racks.select_related("game").filter(game__over=False).order_by("-game__last_activity_at")
 
     def known_users(self):
         """Users which have been in a game with this user"""
@@ -1,5 +1,18 @@
+from common.events import get_broker, get_user_channel
 from common.models import Notification
 
 
 def create_notification(user, notification_type, text, url):
-    Notification.objects.create(user=user, notification_type=notification_type, notification_text=text, view_url=url)
+    notification = Notification.objects.create(
+        user=user, notification_type=notification_type, notification_text=text, view_url=url
+    )
+    get_broker().publish(get_user_channel(user.id), get_notification_data(notification))
+
+
+def get_notification_data(notification):
+    return {
+        "type": notification.notification_type,
+        "text": notification.notification_text,
+        "url": notification.view_url,
+        "created_on": notification.created_on.isoformat(),
+    }
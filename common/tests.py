@@ -1,3 +1,34 @@
+from asgiref.sync import sync_to_async
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from common.constants import NotificationType
+from common.models import User
+from common.notifications import create_notification
+
+
+class NotificationStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("player@example.com")
+        self.since = timezone.now()
+        create_notification(self.user, NotificationType.play, "Missed", "/missed")
+
+    async def test_stream(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse("notification_stream"), {"since": self.since.isoformat()})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertIn(b'"text": "Missed"', await anext(events))
+
+        def notify():
+            with self.captureOnCommitCallbacks(execute=True):
+                create_notification(self.user, NotificationType.play, "New", "/new")
+
+        await sync_to_async(notify)()
+        self.assertIn(b'"text": "New"', await anext(events))
+        await events.aclose()
+
+    async def test_not_logged_in(self):
+        response = await self.async_client.get(reverse("notification_stream"))
+        self.assertEqual(response.status_code, 401)
@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import logout, login
 from django.conf import settings
@@ -5,12 +6,15 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.urls import reverse, reverse_lazy
+from django.utils.dateparse import parse_datetime
 from django.views.generic import FormView
 from django.views.generic.base import TemplateView, View
 from django.http.response import HttpResponse
 
+from common.events import format_event, get_stream_response, get_user_channel, stream_events
 from common.forms import SetPasswordForm, UserSettingsForm, UpdatePasswordForm
 from common.models import User
+from common.notifications import get_notification_data
 from scrabble.helpers import get_user_statistics
 
 
@@ -106,15 +110,28 @@ class PrivacyPolicyView(TemplateView):
     template_name = "common/privacy_policy.html"
 
 
-class NotificationTimestampView(LoginRequiredMixin, View):
-    def get(self, request, *args, **kwargs):
-        timestamp = ""
-        notifications = self.request.user.unread_notifications()
-        if notifications:
-            timestamp = notifications.order_by("-created_on")[0].created_on.isoformat()
-        return JsonResponse({
-            "timestamp": timestamp
-        })
+class NotificationStreamView(View):
+    """
+    Streams the user's new notifications as server-sent events, starting with any created since the given
+    timestamp. A reconnecting EventSource sends the timestamp of the last notification it received as Last-Event-ID.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return JsonResponse({"error": "Not logged in"}, status=401)
+        user = request.user
+        since = parse_datetime(request.headers.get("Last-Event-ID") or request.GET.get("since") or "")
+
+        def format_notification(data):
+            return format_event(data, event_id=data["created_on"])
+
+        def get_missed():
+            if not since:
+                return []
+            notifications = user.unread_notifications().filter(created_on__gt=since).order_by("created_on")
+            return [format_notification(get_notification_data(notification)) for notification in notifications]
+
+        return get_stream_response(stream_events(get_user_channel(user.id), format_notification, get_missed))
 
 
 def error_404(request, exception):
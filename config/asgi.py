@@ -0,0 +1,22 @@
+"""
+ASGI config for config project, needed to stream notifications.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_DICTIONARIES:
+    from scrabble.dictionaries import registry  # noqa: E402
+    registry.preload()
@@ -40,6 +40,17 @@ env = environ.Env(
 
     # Set to True to enable the Django Debug Toolbar
     DEBUG_TOOLBAR=(bool, False),
+
+    # Set to True to load all dictionaries when the application is loaded, e.g. in the gunicorn
+    # master process with --preload (as the Procfile and Dockerfile run it) so that forked workers share them
+    PRELOAD_DICTIONARIES=(bool, False),
+    # Maximum number of word lookups cached per process for word validation
+    WORD_CACHE_SIZE=(int, 10000),
+    # Maximum number of game scorecards cached per process
+    SCORECARD_CACHE_SIZE=(int, 1000),
+    # Delivers notification events within one process ("local"), or to all processes with Postgres LISTEN/NOTIFY
+    # ("postgres"), which is needed when running more than one worker
+    EVENT_BROKER=(str, "local"),
 )
 # If ALLWED_HOSTS has been configured, then we're running on a server and
 # can skip looking for a .env file (this assumes that .env files
@@ -111,6 +122,11 @@ MIDDLEWARE = [
 
 MAINTENANCE_MODE = env("MAINTENANCE_MODE")
 
+PRELOAD_DICTIONARIES = env("PRELOAD_DICTIONARIES")
+WORD_CACHE_SIZE = env("WORD_CACHE_SIZE")
+SCORECARD_CACHE_SIZE = env("SCORECARD_CACHE_SIZE")
+EVENT_BROKER = env("EVENT_BROKER")
+
 
 ROOT_URLCONF = "config.urls"
 
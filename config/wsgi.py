@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_DICTIONARIES:
+    from scrabble.dictionaries import registry  # noqa: E402
+    registry.preload()
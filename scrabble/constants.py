@@ -1,21 +1,23 @@
 from django.db.models import TextChoices
 
+from scrabble.engine import constants as engine_constants
+
 
 class WordGame(TextChoices):
-    scrabble = 'scrabble'
-    upwords = 'upwords'
+    scrabble = engine_constants.SCRABBLE
+    upwords = engine_constants.UPWORDS
 
 
 class Multiplier(TextChoices):
-    dl = 'dl', "Double Letter Score"
-    tl = 'tl', "Triple Letter Score"
-    dw = 'dw', "Double Word Score"
-    tw = 'tw', "Triple Word Score"
-    start = 'start', "Starting Square"
+    dl = engine_constants.DL, "Double Letter Score"
+    tl = engine_constants.TL, "Triple Letter Score"
+    dw = engine_constants.DW, "Double Word Score"
+    tw = engine_constants.TW, "Triple Word Score"
+    start = engine_constants.START, "Starting Square"
 
 
 class TurnAction(TextChoices):
-    play = "play"
+    play = engine_constants.PLAY
     exchange = "exchange"
     pass_turn = "pass"
     forfeit = "forfeit"
@@ -31,4 +33,4 @@ class Dictionary(TextChoices):
     long = "long", "Long Words"
 
 
-BLANK_CHARS = ['-', '*']
+BLANK_CHARS = engine_constants.BLANK_CHARS
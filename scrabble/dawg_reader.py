@@ -0,0 +1,82 @@
+import mmap
+import struct
+
+# Unit layout of the dawgdic dictionary format written by the dawg package
+IS_LEAF_BIT = 1 << 31
+HAS_LEAF_BIT = 1 << 8
+EXTENSION_BIT = 1 << 9
+LABEL_MASK = IS_LEAF_BIT | 0xFF
+
+
+class DawgReader:
+    """
+    Read-only traversal of a DAWG file written by the dawg package.
+    Nodes are read directly from the memory-mapped file, so processes mapping the same file share its pages.
+    Nodes are integer indexes, starting from ROOT.
+    """
+    ROOT = 0
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._mmap)
+        unit_count = struct.unpack_from("<I", data, 0)[0]
+        units_end = 4 + 4 * unit_count
+        self.units = data[4:units_end].cast("I")
+        # Plain DAWG files have no guide, so their nodes can be followed but not enumerated
+        self.guide = None
+        if len(data) > units_end:
+            guide_count = struct.unpack_from("<I", data, units_end)[0]
+            # Each guide unit is a (first child label, next sibling label) byte pair
+            self.guide = data[units_end + 4:units_end + 4 + 2 * guide_count]
+        self.size_bytes = len(self._mmap)
+
+    def child_offset(self, node):
+        """Returns the offset shared by the children of node: the child along label is at child_offset ^ label"""
+        unit = self.units[node]
+        return node ^ ((unit >> 10) << ((unit & EXTENSION_BIT) >> 6))
+
+    def follow(self, node, label):
+        """Returns the child of node along byte label, or None"""
+        unit = self.units[node]
+        child = node ^ ((unit >> 10) << ((unit & EXTENSION_BIT) >> 6)) ^ label
+        if (self.units[child] & LABEL_MASK) != label:
+            return None
+        return child
+
+    def follow_bytes(self, node, labels):
+        for label in labels:
+            node = self.follow(node, label)
+            if node is None:
+                return None
+        return node
+
+    def is_terminal(self, node):
+        """Returns True if a key ends at node"""
+        return bool(self.units[node] & HAS_LEAF_BIT)
+
+    def children(self, node):
+        """Yields (label, child) pairs for all children of node, in label order"""
+        units = self.units
+        guide = self.guide
+        unit = units[node]
+        offset = node ^ ((unit >> 10) << ((unit & EXTENSION_BIT) >> 6))
+        label = guide[node * 2]
+        while label:
+            # Siblings share their parent's offset, so each child is found without a separate follow()
+            child = offset ^ label
+            yield label, child
+            label = guide[child * 2 + 1]
+
+    def first_key(self, node):
+        """Returns the bytes of the first key below node"""
+        key = bytearray()
+        while not self.is_terminal(node):
+            label = self.guide[node * 2]
+            node = self.follow(node, label)
+            key.append(label)
+        return bytes(key)
+
+    def __contains__(self, key):
+        node = self.follow_bytes(self.ROOT, key.encode())
+        return node is not None and self.is_terminal(node)
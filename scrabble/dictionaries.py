@@ -1,46 +1,341 @@
+import base64
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import mmap
 import os
 import string
+import struct
+import threading
+import time
+from collections import OrderedDict
 
 import dawg
 from django.conf import settings
 
 from scrabble.constants import Dictionary, BLANK_CHARS
+from scrabble.dawg_reader import DawgReader
+from scrabble.gaddag import GADDAG_NAME, Gaddag
+
+logger = logging.getLogger(__name__)
+
+COMBINED_INDEX_NAME = "combined"
+# Membership bitmask for each word in the combined index
+COMBINED_INDEX_FORMAT = "<H"
+# Separates each word from its base64 encoded bitmask in the combined index
+PAYLOAD_SEPARATOR = 1
+# Records version, checksum and word count of each built dictionary file
+MANIFEST_NAME = "manifest"
+
+
+def get_dictionary_path(dictionary_name, extension="dawg"):
+    return os.path.join(settings.BASE_DIR, f"dictionaries/{dictionary_name}.{extension}")
+
+
+def read_manifest():
+    try:
+        with open(get_dictionary_path(MANIFEST_NAME, extension="json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(manifest):
+    with open(get_dictionary_path(MANIFEST_NAME, extension="json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def file_checksum(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _read_mapped(d, file_path):
+    """
+    Reads a DAWG from its file. The DAWG copies the file into its own buffer, so its pages belong to the process,
+    though forked workers share them until written.
+    """
+    with open(file_path, "rb") as f:
+        # Read straight from the mapped file to avoid an intermediate copy of the whole dictionary
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            d.read(data)
+    return d
 
 
 def load_dawg(dictionary_name):
-    d = dawg.CompletionDAWG()
     try:
-        file_path = os.path.join(settings.BASE_DIR, f"dictionaries/{dictionary_name}.dawg")
-        d.load(file_path)
+        return _read_mapped(dawg.CompletionDAWG(), get_dictionary_path(dictionary_name))
     except Exception:
         raise Exception(f"Unsupported dictionary {dictionary_name}")
-    return d
 
 
-DAWGS = {
-    dictionary: load_dawg(dictionary.value)
-    for dictionary in Dictionary
-}
+class CombinedIndex:
+    """
+    Single automaton over all dictionaries, mapping each word to a bitmask of the dictionaries which accept it.
+    Bit i corresponds to the i-th entry of dictionary_names.
+    """
+
+    def __init__(self, d, dictionary_names, reader=None):
+        self.dawg = d
+        self.dictionary_names = list(dictionary_names)
+        self.bits = {name: 1 << i for i, name in enumerate(self.dictionary_names)}
+        # Node by node traversal of the same index, for searches
+        self.reader = reader
+        # Words with the same bitmask share their payload nodes, so there are few distinct ones to decode
+        self._payload_masks = {}
+
+    @classmethod
+    def build(cls, dictionary_names):
+        masks = {}
+        for i, dictionary_name in enumerate(dictionary_names):
+            bit = 1 << i
+            for word in load_dawg(dictionary_name).iterkeys():
+                masks[word] = masks.get(word, 0) | bit
+        d = dawg.RecordDAWG(COMBINED_INDEX_FORMAT, ((word, (mask,)) for word, mask in masks.items()))
+        return cls(d, dictionary_names)
+
+    @classmethod
+    def load(cls):
+        dictionary_names = read_manifest()[COMBINED_INDEX_NAME]["sources"]
+        file_path = get_dictionary_path(COMBINED_INDEX_NAME)
+        d = _read_mapped(dawg.RecordDAWG(COMBINED_INDEX_FORMAT), file_path)
+        return cls(d, dictionary_names, reader=DawgReader(file_path))
+
+    def covers(self, dictionary_names):
+        return all(name in self.bits for name in dictionary_names)
 
+    def get_mask(self, dictionary_names):
+        mask = 0
+        for dictionary_name in dictionary_names:
+            mask |= self.bits[dictionary_name]
+        return mask
 
-def validate_word(word, dictionary_names, blank_replacements):
+    def get_dictionaries(self, word):
+        """Returns the names of all dictionaries which accept word"""
+        values = self.dawg.get(word.lower())
+        if not values:
+            return []
+        mask = values[0][0]
+        return [name for name, bit in self.bits.items() if mask & bit]
+
+    def get_node_mask(self, node):
+        """Returns the bitmask of the word ending at reader node, or 0 if no word ends there"""
+        payload_node = self.reader.follow(node, PAYLOAD_SEPARATOR)
+        if payload_node is None:
+            return 0
+        mask = self._payload_masks.get(payload_node)
+        if mask is None:
+            payload = base64.b64decode(self.reader.first_key(payload_node))
+            mask = self._payload_masks[payload_node] = struct.unpack(COMBINED_INDEX_FORMAT, payload)[0]
+        return mask
+
+    def similar_keys(self, word, replaces, dictionary_names):
+        """Returns matching words accepted by any of dictionary_names, in one traversal"""
+        mask = self.get_mask(dictionary_names)
+        return [
+            key for key, values in self.dawg.similar_items(word.lower(), replaces)
+            if values[0][0] & mask
+        ]
+
+
+class DictionaryRegistry:
     """
-    Checks whether matching word exists in dictionary.
-    Side effect: Also updates blank_replacements by reference.
+    Loads dictionary DAWGs on first use, so processes which never validate a word never read the files.
+    Call preload() before forking worker processes to share the loaded dictionaries between them.
     """
-    # Empty replacement list errors -- remove from dict
-    filtered_replacements = {char: value for char, value in blank_replacements.items() if value}
-    replaces = dawg.CompletionDAWG.compile_replaces(filtered_replacements)
+
+    def __init__(self):
+        self._dawgs = {}
+        self._index = None
+        self._gaddag = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, dictionary_name):
+        return dictionary_name in Dictionary.values
+
+    def get(self, dictionary_name):
+        d = self._dawgs.get(dictionary_name)
+        if d is not None:
+            return d
+        if dictionary_name not in self:
+            raise Exception(f"Unsupported dictionary {dictionary_name}")
+        with self._lock:
+            if dictionary_name not in self._dawgs:
+                self._dawgs[dictionary_name] = self._load(dictionary_name, load_dawg, dictionary_name)
+        return self._dawgs[dictionary_name]
+
+    def get_index(self):
+        """Returns the combined index, or None if it has not been built"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    if (
+                        not os.path.exists(get_dictionary_path(COMBINED_INDEX_NAME))
+                        or COMBINED_INDEX_NAME not in read_manifest()
+                    ):
+                        logger.warning("Combined dictionary index not found, run import_dawg --combine")
+                        self._index = False
+                    else:
+                        self._index = self._load(COMBINED_INDEX_NAME, CombinedIndex.load)
+        return self._index or None
+
+    def get_gaddag(self):
+        """Returns the GADDAG of all dictionaries' words, or None if it has not been built"""
+        if self._gaddag is None:
+            with self._lock:
+                if self._gaddag is None:
+                    file_path = get_dictionary_path(GADDAG_NAME)
+                    if not os.path.exists(file_path):
+                        logger.warning("GADDAG not found, run import_dawg --combine")
+                        self._gaddag = False
+                    else:
+                        self._gaddag = self._load(GADDAG_NAME, Gaddag, file_path)
+        return self._gaddag or None
+
+    def _load(self, dictionary_name, loader, *args):
+        start = time.perf_counter()
+        d = loader(*args)
+        load_time_ms = (time.perf_counter() - start) * 1000
+        # The size of the dictionary file, not the memory it occupies
+        file_size_bytes = os.path.getsize(get_dictionary_path(dictionary_name))
+        self._stats[dictionary_name] = {"load_time_ms": round(load_time_ms, 2), "file_size_bytes": file_size_bytes}
+        logger.info(f"Loaded dictionary {dictionary_name} in {load_time_ms:.1f}ms ({file_size_bytes} byte file)")
+        return d
+
+    def preload(self, dictionary_names=None):
+        index = self.get_index()
+        for dictionary_name in dictionary_names or Dictionary.values:
+            # Individual dictionaries are only needed for validation if the combined index doesn't cover them
+            if index is None or not index.covers([dictionary_name]):
+                self.get(dictionary_name)
+
+    def is_loaded(self, dictionary_name):
+        return dictionary_name in self._dawgs
+
+    def stats(self):
+        """Returns load time and file size for each dictionary loaded so far"""
+        return dict(self._stats)
+
+
+registry = DictionaryRegistry()
+
+
+class LRUCache:
+    """Size-bounded, least recently used cache which counts hits, misses and evictions"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_set(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+word_cache = LRUCache(settings.WORD_CACHE_SIZE)
+
+
+@functools.cache
+def get_replaces(blank_chars):
+    """Returns the compiled replace table allowing each of blank_chars to match any letter"""
+    return dawg.CompletionDAWG.compile_replaces({char: list(string.ascii_lowercase) for char in blank_chars})
+
+
+def find_matches(word, dictionary_names):
+    """Returns the words in any of the dictionaries matching word, with blank chars matching any letter"""
+    word = word.lower()
+    # The blank pattern is part of the word itself, e.g. "c-t"
+    key = (word, frozenset(dictionary_names))
+    return word_cache.get_or_set(key, lambda: _find_matches(word, dictionary_names))
+
+
+def _find_matches(word, dictionary_names):
+    replaces = get_replaces(tuple(char for char in BLANK_CHARS if char in word))
+    index = registry.get_index()
+    if index is not None and index.covers(dictionary_names):
+        return frozenset(index.similar_keys(word, replaces, dictionary_names))
     matches = set()
     for dictionary_name in dictionary_names:
-        if dictionary_name not in DAWGS:
-            raise Exception(f"Unsupported dictionary {dictionary_name}")
-        d = DAWGS[dictionary_name]
-        matches.update(d.similar_keys(word.lower(), replaces))
-    for char in BLANK_CHARS:
-        if char in word:
-            i = word.index(char)
-            char_matches = [match[i] for match in matches]
-            # Update replacement lists in place (passed by reference)
-            blank_replacements[char] = char_matches
-    return bool(matches)
+        d = registry.get(dictionary_name)
+        matches.update(d.similar_keys(word, replaces))
+    return frozenset(matches)
+
+
+def validate_word(word, dictionary_names):
+    """Checks whether matching word exists in any of the dictionaries."""
+    return bool(find_matches(word, dictionary_names))
+
+
+def solve_blanks(words, dictionary_names):
+    """
+    Validates all words formed by a play together, choosing one letter for each blank char.
+    The chosen letters are those making the most words valid (alphabetically first on ties),
+    so the result does not depend on the order of words.
+    Returns (invalid_words, blank_assignment), where blank_assignment maps each blank char in the words
+    to its lowercase letter, or to None if no letter makes any word containing it valid.
+    """
+    blank_chars = [char for char in BLANK_CHARS if any(char in word for word in words)]
+    # For each word, the blank letter combinations (None where the word doesn't contain the blank) that are valid
+    word_options = []
+    for word in words:
+        word_options.append({
+            tuple(match[word.index(char)] if char in word else None for char in blank_chars)
+            for match in find_matches(word, dictionary_names)
+        })
+    if not blank_chars:
+        return [word for word, options in zip(words, word_options) if not options], {}
+    # Only letters which make at least one word valid need to be considered for each blank
+    candidate_letters = [
+        sorted({option[i] for options in word_options for option in options if option[i]}) + [None]
+        for i in range(len(blank_chars))
+    ]
+    best_key, best_invalid_words, best_letters = None, None, None
+    for letters in itertools.product(*candidate_letters):
+        invalid_words = []
+        for word, options in zip(words, word_options):
+            projected = tuple(letter if char in word else None for char, letter in zip(blank_chars, letters))
+            if projected not in options:
+                invalid_words.append(word)
+        key = (len(invalid_words), letters.count(None))
+        if best_key is None or key < best_key:
+            best_key, best_invalid_words, best_letters = key, invalid_words, letters
+    return best_invalid_words, dict(zip(blank_chars, best_letters))
@@ -0,0 +1,55 @@
+import string
+
+from scrabble.engine.constants import BLANK_CHARS
+
+# The tile counted by each position of a LetterBag's counts
+BAG_TILES = [*string.ascii_uppercase, *BLANK_CHARS]
+BAG_INDEX = {tile: i for i, tile in enumerate(BAG_TILES)}
+
+
+class LetterBag:
+    """
+    Tiles left to draw, as the count of each tile of BAG_TILES. The counts list is changed in place by draws and
+    returns, so a bag can wrap a saved list.
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    @classmethod
+    def from_tiles(cls, tiles):
+        counts = [0] * len(BAG_TILES)
+        for tile in tiles:
+            counts[BAG_INDEX[tile]] += 1
+        return cls(counts)
+
+    @classmethod
+    def from_frequencies(cls, tile_frequencies):
+        return cls([tile_frequencies.get(tile, 0) for tile in BAG_TILES])
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def tiles(self):
+        """Returns the tiles in the bag, in BAG_TILES order"""
+        return [tile for tile, count in zip(BAG_TILES, self.counts) for _ in range(count)]
+
+    def draw(self, num_tiles, rng):
+        """Removes and returns up to num_tiles tiles, each chosen with probability proportional to its count"""
+        tiles = []
+        remaining = len(self)
+        for _ in range(min(num_tiles, remaining)):
+            choice = rng.randrange(remaining)
+            for i, count in enumerate(self.counts):
+                if choice < count:
+                    break
+                choice -= count
+            self.counts[i] -= 1
+            remaining -= 1
+            tiles.append(BAG_TILES[i])
+        return tiles
+
+    def add(self, tiles):
+        """Returns tiles to the bag"""
+        for tile in tiles:
+            self.counts[BAG_INDEX[tile]] += 1
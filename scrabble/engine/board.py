@@ -0,0 +1,81 @@
+class BoardLine:
+    """A row or column of a GameBoard, indexed along its length without copying squares"""
+
+    def __init__(self, squares, start, step, size):
+        self.squares = squares
+        self.start = start
+        self.step = step
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return self.squares[self.start + i * self.step]
+
+    def coordinates(self, i):
+        """Returns the board (x, y) coordinates of square i of the line"""
+        y, x = divmod(self.start + i * self.step, self.size)
+        return x, y
+
+
+class GameBoard:
+    """
+    Board squares in a flat row-major list, each square holding its stacked tiles, most recent first.
+    Changes are also written to the nested board list it was created from.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.size = len(board)
+        self.squares = [square for row in board for square in row]
+
+    def get_tile(self, x, y, most_recent=False):
+        tile = self.squares[y * self.size + x]
+        if tile and most_recent:
+            return tile[0]
+        return tile
+
+    def set_tile(self, tile, x, y, replace=False):
+        existing = self.get_tile(x, y) if not replace else ""
+        self.squares[y * self.size + x] = self.board[y][x] = tile + existing
+
+    def is_first_play(self):
+        """Returns True if no plays have been made yet on this board"""
+        return not any(self.squares)
+
+    def is_free_square(self, x, y):
+        """Returns True if the specified square has not yet been played"""
+        return self.squares[y * self.size + x] == ""
+
+    def has_adjacent_tile(self, x, y):
+        """Returns True if a square next to (x, y) has a tile"""
+        return any(
+            0 <= nx < self.size and 0 <= ny < self.size and self.squares[ny * self.size + nx]
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+        )
+
+    def update_board(self, play):
+        for played_tile in play:
+            self.set_tile(played_tile['tile'], played_tile['x'], played_tile['y'])
+
+    def row(self, y):
+        return BoardLine(self.squares, y * self.size, 1, self.size)
+
+    def column(self, x):
+        return BoardLine(self.squares, x, self.size, self.size)
+
+    def get_line(self, played_tiles, vertical=None):
+        """
+        Returns the line through played_tiles and the position of each tile along it: their column if vertical,
+        otherwise their row. By default plays are vertical if their tiles aren't all in one row.
+        """
+        if vertical is None:
+            vertical = is_vertical_play(played_tiles)
+        if vertical:
+            return self.column(played_tiles[0]['x']), [tile['y'] for tile in played_tiles]
+        return self.row(played_tiles[0]['y']), [tile['x'] for tile in played_tiles]
+
+
+def is_vertical_play(played_tiles):
+    return len(set(tile['y'] for tile in played_tiles)) != 1
@@ -0,0 +1,64 @@
+# Plain values of the game rules, usable without Django
+
+SCRABBLE = "scrabble"
+UPWORDS = "upwords"
+
+BLANK_CHARS = ['-', '*']
+
+# Turn action which changes the board
+PLAY = "play"
+
+# Premium squares
+DL = "dl"
+TL = "tl"
+DW = "dw"
+TW = "tw"
+START = "start"
+
+BOARD_CONFIG = [
+    [TW, None, None, DL, None, None, None, TW, None, None, None, DL, None, None, TW],
+    [None, DW, None, None, None, TL, None, None, None, TL, None, None, None, DW, None],
+    [None, None, DW, None, None, None, DL, None, DL, None, None, None, DW, None, None],
+    [DL, None, None, DW, None, None, None, DL, None, None, None, DW, None, None, DL],
+    [None, None, None, None, DW, None, None, None, None, None, DW, None, None, None, None],
+    [None, TL, None, None, None, TL, None, None, None, TL, None, None, None, TL, None],
+    [None, None, DL, None, None, None, DL, None, DL, None, None, None, DL, None, None],
+    [TW, None, None, DL, None, None, None, START, None, None, None, DL, None, None, TW],
+    [None, None, DL, None, None, None, DL, None, DL, None, None, None, DL, None, None],
+    [None, TL, None, None, None, TL, None, None, None, TL, None, None, None, TL, None],
+    [None, None, None, None, DW, None, None, None, None, None, DW, None, None, None, None],
+    [DL, None, None, DW, None, None, None, DL, None, None, None, DW, None, None, DL],
+    [None, None, DW, None, None, None, DL, None, DL, None, None, None, DW, None, None],
+    [None, DW, None, None, None, TL, None, None, None, TL, None, None, None, DW, None],
+    [TW, None, None, DL, None, None, None, TW, None, None, None, DL, None, None, TW],
+]
+
+TILE_SCORES = {
+    'A': 1,
+    'B': 3,
+    'C': 3,
+    'D': 2,
+    'E': 1,
+    'F': 4,
+    'G': 2,
+    'H': 4,
+    'I': 1,
+    'J': 8,
+    'K': 5,
+    'L': 1,
+    'M': 3,
+    'N': 1,
+    'O': 1,
+    'P': 3,
+    'Q': 10,
+    'R': 1,
+    'S': 1,
+    'T': 1,
+    'U': 1,
+    'V': 4,
+    'W': 4,
+    'X': 8,
+    'Y': 4,
+    'Z': 10,
+}
+TILE_SCORES.update({char: 0 for char in BLANK_CHARS})
@@ -0,0 +1,63 @@
+from collections import Counter
+
+from scrabble.engine.bag import BAG_TILES, LetterBag
+from scrabble.engine.board import GameBoard
+from scrabble.engine.constants import BLANK_CHARS, PLAY
+
+
+class ReplayState:
+    """
+    Board and player scores of a game after its turns up to turn_count, rebuilt by applying turns from its log.
+    Scores and racks are indexed by player turn index. Tiles drawn aren't logged, so racks and the letter bag are
+    only known once set_racks is given each player's rack at that point.
+    """
+
+    def __init__(self, board, scores, turn_count=0):
+        self.board = board
+        self.scores = scores
+        self.turn_count = turn_count
+        self.racks = None
+        self.letter_bag = None
+
+    @classmethod
+    def initial(cls, board_size, player_count):
+        return cls([["" for _ in range(board_size)] for _ in range(board_size)], [0] * player_count)
+
+    @classmethod
+    def from_json(cls, data, board_size):
+        board = [["" for _ in range(board_size)] for _ in range(board_size)]
+        for x, y, square in data["squares"]:
+            board[y][x] = square
+        return cls(board, list(data["scores"]), data["turn_count"])
+
+    def to_json(self):
+        """Returns the state with only the occupied squares of the board"""
+        squares = [[x, y, square] for y, row in enumerate(self.board) for x, square in enumerate(row) if square]
+        return {"turn_count": self.turn_count, "squares": squares, "scores": self.scores}
+
+    def apply_turn(self, turn_count, turn_index, action, turn_data, score):
+        """Applies a turn of the log, given the turn_data and score it was saved with"""
+        if action == PLAY:
+            GameBoard(self.board).update_board(turn_data["played_tiles"])
+        self.scores[turn_index] += score
+        self.turn_count = turn_count
+
+    def set_racks(self, racks, tile_frequencies):
+        """Sets the players' racks, and the letter bag as the tiles on neither the board nor a rack"""
+        self.racks = racks
+        self.letter_bag = get_letter_bag(tile_frequencies, self.board, racks)
+
+
+def get_square_tiles(square):
+    """Returns the tiles stacked on a square, a played blank such as '-A' being one tile"""
+    if square and square[0] in BLANK_CHARS:
+        return [square[0]]
+    return list(square)
+
+
+def get_letter_bag(tile_frequencies, board, racks):
+    """Returns the LetterBag of tiles not on the board or in any player's rack"""
+    used = Counter(tile for row in board for square in row for tile in get_square_tiles(square))
+    for rack in racks:
+        used.update(rack)
+    return LetterBag([max(tile_frequencies.get(tile, 0) - used[tile], 0) for tile in BAG_TILES])
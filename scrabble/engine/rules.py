@@ -0,0 +1,264 @@
+import functools
+
+from scrabble.engine.board import GameBoard, is_vertical_play
+from scrabble.engine.constants import BOARD_CONFIG, DL, DW, SCRABBLE, START, TILE_SCORES, TL, TW, UPWORDS
+
+MAX_STACK_HEIGHT = 5
+CENTER_SQUARES = {(4, 4), (4, 5), (5, 4), (5, 5)}
+
+
+class PlayError(Exception):
+    """Raised for a play which breaks the rules of the game"""
+
+
+class GameEngine:
+    """
+    Validation and scoring rules of a game type, on plain values: boards are nested lists of squares (board[y][x],
+    stacked tiles most recent first), racks lists of tiles and plays lists of {"tile", "x", "y"} dicts.
+    Engines hold no per-game state and never modify their arguments, so one instance serves every game.
+    """
+    game_type = None
+    board_size = None
+    bingo_points = 50
+    rack_size = 7
+
+    def validate_play(self, board, rack, played_tiles, connected=None):
+        """
+        Raises PlayError if played_tiles can't be played from rack on board, a board list or a GameBoard.
+        connected[y][x] is True for squares next to a tile, and is worked out from board if not given.
+        """
+        if not isinstance(board, GameBoard):
+            board = GameBoard(board)
+        if not played_tiles:
+            raise PlayError("No tiles played")
+        # Play must only include tiles which are in the user's rack
+        if any(tile['tile'][0] not in rack for tile in played_tiles):
+            raise PlayError("Invalid tile, not in rack")
+        if board.is_first_play():
+            # Check that starting tile is included
+            self.validate_first_play(played_tiles)
+            # First play must be at least 2 letters
+            if len(played_tiles) < 2:
+                raise PlayError("First play must use at least 2 tiles")
+        else:
+            # Subsequent plays must be adjacent to existing word
+            if connected is None:
+                is_connected = board.has_adjacent_tile
+            else:
+                def is_connected(x, y):
+                    return connected[y][x]
+            if not any(is_connected(tile['x'], tile['y']) for tile in played_tiles):
+                raise PlayError("Disconnected play")
+        # Play must not repeat a square
+        if len(set([(tile['x'], tile['y']) for tile in played_tiles])) != len(played_tiles):
+            raise PlayError("Play includes a square twice")
+        # Play must be in a single row or column
+        if len(set(tile['x'] for tile in played_tiles)) > 1 and len(set(tile['y'] for tile in played_tiles)) > 1:
+            raise PlayError("Play not in line")
+        # Play must not have gaps
+        line, positions = board.get_line(played_tiles)
+        for i in range(min(positions), max(positions)):
+            if i not in positions and line[i] == "":
+                raise PlayError("Play not contiguous")
+        self.validate_squares(board, played_tiles)
+
+    def validate_first_play(self, played_tiles):
+        raise NotImplementedError()
+
+    def validate_squares(self, board, played_tiles):
+        """Checks the squares played on are allowed, given the GameBoard before the play"""
+
+    def calculate_points(self, board, played_tiles):
+        """Returns (points, words) of played_tiles on board, a board list or a GameBoard, main word first"""
+        if not isinstance(board, GameBoard):
+            board = GameBoard(board)
+        points = 0
+        words = []
+        vertical = is_vertical_play(played_tiles)
+
+        def _handle_word(tiles, vertical):
+            line, positions = board.get_line(tiles, vertical)
+            played = sorted(zip(positions, (tile['tile'] for tile in tiles)))
+            word_points, word = self.calculate_word_points(line, played)
+            if word:
+                words.append(word)
+            return word_points
+        # Get play direction word & points
+        points += _handle_word(played_tiles, vertical)
+        # Get perpendicular words & points
+        for tile in played_tiles:
+            points += _handle_word([tile], not vertical)
+        # Add bingo points
+        if len(played_tiles) == self.rack_size:
+            points += self.bingo_points
+        return points, words
+
+    def calculate_word_points(self, line, played):
+        """
+        Returns (points, word) for the word along line through the played (position, tile) pairs, sorted by position,
+        or (0, None) if they don't form a word
+        """
+        raise NotImplementedError()
+
+    def get_unplayed_tile_points(self, tile):
+        raise NotImplementedError()
+
+
+class ScrabbleEngine(GameEngine):
+    game_type = SCRABBLE
+    board_size = 15
+    center = (7, 7)
+
+    def validate_first_play(self, played_tiles):
+        # First play must include center tile
+        if not any((tile['x'], tile['y']) == self.center for tile in played_tiles):
+            raise PlayError("First play must include center tile")
+
+    def validate_squares(self, board, played_tiles):
+        # Play must not overlap an existing tile
+        if any([not board.is_free_square(tile['x'], tile['y']) for tile in played_tiles]):
+            raise PlayError("Play includes non-empty square")
+
+    def calculate_word_points(self, line, played):
+        start = played[0][0]
+        while start > 0 and line[start - 1]:
+            start -= 1
+        word = ''
+        tile_index = 0
+        word_multiplier = 1
+        points = 0
+        for i in range(start, len(line)):
+            tile = line[i]
+            if tile:
+                points += TILE_SCORES[tile[0]]
+                word += tile[-1]
+            elif tile_index < len(played) and played[tile_index][0] == i:
+                tile = played[tile_index][1]
+                letter_points = TILE_SCORES[tile[0]]
+                x, y = line.coordinates(i)
+                multiplier = BOARD_CONFIG[y][x]
+                if multiplier == DL:
+                    letter_points *= 2
+                if multiplier == TL:
+                    letter_points *= 3
+                if multiplier in [DW, START]:
+                    word_multiplier *= 2
+                if multiplier == TW:
+                    word_multiplier *= 3
+                points += letter_points
+                word += tile[-1]
+                tile_index += 1
+            else:
+                break
+        points *= word_multiplier
+        if len(word) > 1:
+            return points, word
+        return 0, None
+
+    def get_unplayed_tile_points(self, tile):
+        return TILE_SCORES[tile]
+
+
+def is_duplicate_tile(tile, stack, prevent_stack_duplicates):
+    """Returns True if tile may not be played on stack (most recent tile first)"""
+    if prevent_stack_duplicates:
+        return tile in stack
+    return stack[:1] == tile
+
+
+def get_tile_letters(tile):
+    """Returns the letters spelled by a tile, the Q tile spelling Qu"""
+    return "QU" if tile == "Q" else tile
+
+
+def get_word_points(heights, has_q):
+    """Returns the points of a word from the stack height of each of its squares"""
+    points = sum(heights)
+    # Words with no stacked tiles score double, with a bonus for the Qu tile
+    if max(heights) == 1:
+        if has_q:
+            points += 1
+        points *= 2
+    return points
+
+
+class UpwordsEngine(GameEngine):
+    game_type = UPWORDS
+    board_size = 10
+    bingo_points = 20
+
+    def __init__(self, prevent_stack_duplicates=False):
+        self.prevent_stack_duplicates = prevent_stack_duplicates
+
+    def validate_first_play(self, played_tiles):
+        # First play must include one of the center tiles
+        if not any((tile['x'], tile['y']) in CENTER_SQUARES for tile in played_tiles):
+            raise PlayError("First play must include a center tile")
+
+    def validate_squares(self, board, played_tiles):
+        if not any(board.get_tile(tile['x'], tile['y']) for tile in played_tiles):
+            return
+        # Can't stack over 5 tiles high
+        if any(len(board.get_tile(tile['x'], tile['y'])) >= MAX_STACK_HEIGHT for tile in played_tiles):
+            raise PlayError(f"Stack is over {MAX_STACK_HEIGHT} high")
+        # Can't duplicate an existing tile in the same position
+        prevent_stack_duplicates = self.prevent_stack_duplicates
+        if any(
+            is_duplicate_tile(tile["tile"], board.get_tile(tile['x'], tile['y']), prevent_stack_duplicates)
+            for tile in played_tiles
+        ):
+            raise PlayError("Duplicated tile in stack" if prevent_stack_duplicates else "Duplicated tile")
+        # Can't cover a whole word
+        line, positions = board.get_line(played_tiles)
+        start, end = min(positions), max(positions)
+        if (
+            end - start + 1 == len(played_tiles)
+            and (start == 0 or line[start - 1] == "")
+            and (end == len(line) - 1 or line[end + 1] == "")
+            and any((line[i] and line[i + 1]) for i in range(start, end))
+        ):
+            raise PlayError("Play covers entire word")
+
+    def calculate_word_points(self, line, played):
+        start = played[0][0]
+        while start > 0 and line[start - 1]:
+            start -= 1
+        word = ''
+        tile_index = 0
+        heights = []
+        has_q = False
+        for i in range(start, len(line)):
+            letter = None
+            board_tiles = line[i]
+            letter_points = len(board_tiles)
+            if board_tiles:
+                letter = board_tiles[0]
+            if tile_index < len(played) and played[tile_index][0] == i:
+                letter = played[tile_index][1]
+                letter_points += 1
+                tile_index += 1
+            if letter is None:
+                break
+            word += letter
+            if letter == 'Q':
+                has_q = True
+                word += 'U'
+            heights.append(letter_points)
+        if len(heights) > 1:
+            return get_word_points(heights, has_q), word
+        return 0, None
+
+    def get_unplayed_tile_points(self, tile):
+        return 5
+
+
+ENGINES = {
+    SCRABBLE: ScrabbleEngine,
+    UPWORDS: UpwordsEngine,
+}
+
+
+@functools.cache
+def get_engine(game_type, **options):
+    """Returns the shared engine for game_type with these rule options"""
+    return ENGINES[game_type](**options)
@@ -0,0 +1,50 @@
+import dawg
+
+from scrabble.dawg_reader import DawgReader
+
+GADDAG_NAME = "gaddag"
+# Separates the reversed prefix from the suffix of each GADDAG path
+SEPARATOR = ord("+")
+
+
+def gaddag_keys(words):
+    """
+    Yields the GADDAG paths of each word: for every split point, the reversed prefix, the separator, then the suffix.
+    E.g. "cat" gives "c+at", "ac+t" and "tac+", so a word can be walked outwards from any of its letters.
+    """
+    for word in words:
+        for i in range(1, len(word) + 1):
+            yield f"{word[:i][::-1]}{chr(SEPARATOR)}{word[i:]}"
+
+
+def build_gaddag(words):
+    """Builds the minimized GADDAG automaton, with the completion guide so the children of each node can be listed"""
+    return dawg.CompletionDAWG(gaddag_keys(words))
+
+
+class Gaddag(DawgReader):
+    """
+    GADDAG traversed directly from its memory-mapped file.
+    Walk left from an anchor by following letters of the reversed prefix, then follow SEPARATOR to walk right.
+    """
+
+    def contains(self, word):
+        """Returns True if word is in the lexicon, walking from its first letter"""
+        if not word:
+            return False
+        word = word.lower().encode()
+        node = self.follow(self.ROOT, word[0])
+        if node is None:
+            return False
+        node = self.follow(node, SEPARATOR)
+        if node is None:
+            return False
+        node = self.follow_bytes(node, word[1:])
+        return node is not None and self.is_terminal(node)
+
+    def infix_node(self, infix):
+        """
+        Returns the node reached after walking infix from its last letter back to its first, or None if no word
+        contains infix. Words containing infix continue from this node, leftwards and then rightwards.
+        """
+        return self.follow_bytes(self.ROOT, infix.lower().encode()[::-1])
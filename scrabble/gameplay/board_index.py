@@ -0,0 +1,114 @@
+import string
+
+from scrabble.constants import BLANK_CHARS
+from scrabble.dictionaries import find_matches
+
+ALL_LETTERS_MASK = (1 << 26) - 1
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(string.ascii_lowercase)}
+# Directions of play, indexing BoardIndex.cross_checks
+HORIZONTAL = 0
+VERTICAL = 1
+
+
+class BoardIndex:
+    """
+    Cross-check letter masks and connected squares of a board, updated incrementally as tiles are played or removed.
+    cross_checks[direction][y][x] is the mask of letters which can be played on (x, y) in a play in direction, given
+    the word formed perpendicular to it, or None if no perpendicular word is formed.
+    connected[y][x] is True if (x, y) has an adjacent tile. Anchor squares are the connected empty squares.
+    """
+    # Whether tiles can be played on occupied squares
+    stacking = False
+
+    def __init__(self, dictionary_names, cross_checks, connected):
+        self.dictionary_names = sorted(dictionary_names)
+        self.cross_checks = cross_checks
+        self.connected = connected
+
+    @classmethod
+    def build(cls, board, dictionary_names):
+        size = len(board)
+        index = cls(
+            dictionary_names,
+            [[[None] * size for _ in range(size)] for _ in (HORIZONTAL, VERTICAL)],
+            [[False] * size for _ in range(size)],
+        )
+        for y in range(size):
+            for x in range(size):
+                index.connected[y][x] = index._is_connected(board, x, y)
+                index._update_square(board, x, y)
+        return index
+
+    @classmethod
+    def from_json(cls, data, dictionary_names):
+        """Returns the index saved by to_json, or None if there is none for these dictionaries"""
+        if not data or data["dictionaries"] != sorted(dictionary_names):
+            return None
+        return cls(dictionary_names, data["cross_checks"], data["connected"])
+
+    def to_json(self):
+        return {"dictionaries": self.dictionary_names, "cross_checks": self.cross_checks, "connected": self.connected}
+
+    def update(self, board, squares):
+        """Updates the index after tiles were played on or removed from squares of board"""
+        size = len(board)
+        for x, y in squares:
+            for nx, ny in ((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if 0 <= nx < size and 0 <= ny < size:
+                    self.connected[ny][nx] = self._is_connected(board, nx, ny)
+            # Squares of the perpendicular words through the tiles of x's column and y's row, and the squares
+            # just beyond them, may have changed
+            for dx, dy in ((0, 1), (1, 0)):
+                start_x, start_y = x, y
+                while 0 <= start_x - dx and 0 <= start_y - dy and board[start_y - dy][start_x - dx]:
+                    start_x, start_y = start_x - dx, start_y - dy
+                if 0 <= start_x - dx and 0 <= start_y - dy:
+                    start_x, start_y = start_x - dx, start_y - dy
+                end_x, end_y = x, y
+                while end_x + dx < size and end_y + dy < size and board[end_y + dy][end_x + dx]:
+                    end_x, end_y = end_x + dx, end_y + dy
+                if end_x + dx < size and end_y + dy < size:
+                    end_x, end_y = end_x + dx, end_y + dy
+                for i in range(max(end_x - start_x, end_y - start_y) + 1):
+                    self._update_square(board, start_x + i * dx, start_y + i * dy)
+
+    def is_anchor(self, board, x, y):
+        return self.connected[y][x] and not board[y][x]
+
+    def _is_connected(self, board, x, y):
+        size = len(board)
+        return any(
+            0 <= nx < size and 0 <= ny < size and board[ny][nx]
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+        )
+
+    def _update_square(self, board, x, y):
+        for direction, (dx, dy) in ((HORIZONTAL, (0, 1)), (VERTICAL, (1, 0))):
+            if board[y][x] and not self.stacking:
+                mask = 0
+            else:
+                before = self._get_letters(board, x, y, -dx, -dy)[::-1]
+                after = self._get_letters(board, x, y, dx, dy)
+                mask = self.get_letter_mask("".join(before), "".join(after)) if before or after else None
+            self.cross_checks[direction][y][x] = mask
+
+    def _get_letters(self, board, x, y, dx, dy):
+        """Returns the letters of the tiles from next to (x, y) up to the first empty square in direction (dx, dy)"""
+        size = len(board)
+        letters = []
+        x, y = x + dx, y + dy
+        while 0 <= x < size and 0 <= y < size and board[y][x]:
+            letters.append(self.get_tile_letters(board[y][x]))
+            x, y = x + dx, y + dy
+        return letters
+
+    def get_tile_letters(self, square):
+        """Returns the lower case letters of the tile on a square"""
+        return square[-1].lower()
+
+    def get_letter_mask(self, before, after):
+        """Returns the mask of letters which make a valid word between before and after"""
+        mask = 0
+        for match in find_matches(f"{before}{BLANK_CHARS[0]}{after}", self.dictionary_names):
+            mask |= LETTER_BITS[match[len(before)]]
+        return mask
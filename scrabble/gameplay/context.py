@@ -0,0 +1,131 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from common.events import get_broker, get_game_channel
+from scrabble.constants import TurnAction
+from scrabble.gameplay.statistics import StatisticsUpdate
+from scrabble.models import GameCheckpoint, GamePlayer, GameTurn, ScrabbleGame
+
+# Fields of the game and players changed by turns, saved by GameContext.flush
+GAME_FIELDS = ["board", "board_index", "bag_counts", "tiles_drawn", "next_turn_index", "turn_count", "over"]
+PLAYER_FIELDS = ["rack", "score", "forfeited", "winner", "updated_on"]
+
+
+class GameContext:
+    """
+    Unit of work for a turn: loads all players of a game once, applies changes to the game, players and new turns
+    in memory, and writes them with one query each on flush, along with the players' statistics.
+    The game is only written if its version is unchanged since it was loaded, so concurrent turns can't both apply.
+    Once written, the changes are published to the game's channel for open game pages.
+    """
+
+    def __init__(self, game, game_player=None):
+        self.game = game
+        # Use the caller's instance of game_player, so its changes are seen by both
+        self.players = sorted(
+            (game_player if game_player and player.id == game_player.id else player for player in game.racks.all()),
+            key=lambda player: player.turn_index,
+        )
+        self.changed_players = {}
+        self.turns = []
+        self.checkpoints = []
+        self.changed_squares = []
+        self.was_over = game.over
+
+    def save_player(self, player):
+        """Marks player as changed, to be saved on flush"""
+        self.changed_players[player.id] = player
+
+    def create_turn(self, game_player, **kwargs):
+        """Returns a new turn of game_player, numbered from the game's turn count, to be created on flush"""
+        self.game.turn_count += 1
+        turn = GameTurn(
+            game_player=game_player, turn_count=self.game.turn_count, version=self.game.version + 1, **kwargs
+        )
+        self.turns.append(turn)
+        return turn
+
+    def update_squares(self, squares):
+        """Marks the (x, y) squares of the board changed by the turn"""
+        self.changed_squares.extend(squares)
+
+    def add_checkpoint(self, checkpoint):
+        """Adds a GameCheckpoint to be created on flush, if not None"""
+        if checkpoint:
+            self.checkpoints.append(checkpoint)
+
+    def next_player(self):
+        return self.players[self.game.next_turn_index]
+
+    def players_with_tiles(self):
+        return [player for player in self.players if player.rack]
+
+    def update_turn_index(self, backwards=False):
+        """Moves the turn to the next player, skipping players with no tiles left unless no one has any"""
+        update = -1 if backwards else 1
+        self.game.next_turn_index = (self.game.next_turn_index + update) % len(self.players)
+        if not self.players_with_tiles():
+            return
+        while not self.next_player().rack:
+            self.game.next_turn_index = (self.game.next_turn_index + update) % len(self.players)
+
+    def winners(self):
+        players = sorted((player for player in self.players if not player.forfeited), key=lambda p: -p.score)
+        return [player for player in players if player.score == players[0].score]
+
+    def get_statistics_update(self):
+        """Returns the StatisticsUpdate for the new plays, and for the players' results if the game just ended"""
+        statistics = StatisticsUpdate()
+        for turn in self.turns:
+            if turn.turn_action == TurnAction.play:
+                statistics.add_play(turn.game_player.user_id, turn.score, turn.turn_words)
+        if self.game.over and not self.was_over:
+            for player in self.players:
+                statistics.add_game(player.user_id, player.score, player.winner)
+        return statistics
+
+    def get_delta(self, version):
+        """Returns the changes made by the turn that other players can see, for the game at version"""
+        return {
+            "version": version,
+            "turn_count": self.game.turn_count,
+            "squares": [[x, y, self.game.board[y][x]] for x, y in self.changed_squares],
+            "scores": [player.score for player in self.players],
+            "next_turn_index": self.game.next_turn_index,
+            "bag_size": len(self.game.letter_bag),
+            "over": self.game.over,
+        }
+
+    def flush(self):
+        """Writes the changes, raising ValidationError if another turn was written since the game was loaded"""
+        now = timezone.now()
+        with transaction.atomic(savepoint=False):
+            updated = ScrabbleGame.objects.filter(id=self.game.id, version=self.game.version).update(
+                version=self.game.version + 1,
+                updated_on=now,
+                last_activity_at=now,
+                **{field: getattr(self.game, field) for field in GAME_FIELDS},
+            )
+            if updated:
+                if self.changed_players:
+                    # bulk_update doesn't set auto_now fields
+                    for player in self.changed_players.values():
+                        player.updated_on = now
+                    GamePlayer.objects.bulk_update(self.changed_players.values(), PLAYER_FIELDS)
+                if self.turns:
+                    GameTurn.objects.bulk_create(self.turns)
+                if self.checkpoints:
+                    GameCheckpoint.objects.bulk_create(self.checkpoints)
+                self.get_statistics_update().save()
+                get_broker().publish(get_game_channel(self.game.id), self.get_delta(self.game.version + 1))
+        # Nothing was written, so the enclosing transaction can continue
+        if not updated:
+            raise ValidationError("The game has changed since this turn was made, please reload.")
+        self.game.version += 1
+        self.game.updated_on = now
+        self.game.last_activity_at = now
+        self.changed_players = {}
+        self.turns = []
+        self.checkpoints = []
+        self.changed_squares = []
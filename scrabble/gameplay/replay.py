@@ -0,0 +1,56 @@
+from scrabble.engine.replay import ReplayState
+from scrabble.models import GameCheckpoint
+
+# Turns between saved checkpoints, bounding the turns applied to rebuild any point of a game
+CHECKPOINT_INTERVAL = 10
+
+
+class GameReplayer:
+    """Rebuilds a game at any turn from its turn log, starting from the latest checkpoint before that turn"""
+
+    def __init__(self, calculator):
+        self.calculator = calculator
+        self.game = calculator.game
+
+    def get_state(self, turn_count=None):
+        """Returns the ReplayState after the turns up to turn_count, or after all turns if None"""
+        checkpoints = self.game.checkpoints.order_by("-turn_count")
+        turns = self.game.all_turns()
+        if turn_count is not None:
+            checkpoints = checkpoints.filter(turn_count__lte=turn_count)
+            turns = turns.filter(turn_count__lte=turn_count)
+        checkpoint = checkpoints.first()
+        if checkpoint:
+            state = ReplayState.from_json(checkpoint.state, self.calculator.engine.board_size)
+            turns = turns.filter(turn_count__gt=checkpoint.turn_count)
+        else:
+            state = ReplayState.initial(self.calculator.engine.board_size, self.game.racks.count())
+        for turn in turns:
+            state.apply_turn(turn.turn_count, turn.game_player.turn_index, turn.turn_action, turn.turn_data, turn.score)
+        state.set_racks(self.get_racks(turn_count), self.calculator.tile_frequencies)
+        return state
+
+    def get_racks(self, turn_count=None):
+        """Returns each player's rack after the turns up to turn_count: the rack before their next turn, if any"""
+        racks = list(self.game.racks.order_by("turn_index").values_list("rack", flat=True))
+        if turn_count is not None:
+            next_turns = self.game.all_turns().filter(turn_count__gt=turn_count).order_by(
+                "game_player_id", "turn_count"
+            ).distinct("game_player_id")
+            for turn in next_turns:
+                racks[turn.game_player.turn_index] = turn.rack_before_turn
+        return racks
+
+    def get_checkpoint(self, turn_count, scores):
+        """
+        Returns an unsaved checkpoint of the current board and scores, indexed by turn index, if turn_count is due one
+        """
+        if turn_count % CHECKPOINT_INTERVAL:
+            return None
+        return GameCheckpoint(
+            game=self.game, turn_count=turn_count, state=ReplayState(self.game.board, scores, turn_count).to_json()
+        )
+
+    def delete_checkpoints(self, turn_count):
+        """Deletes checkpoints which include the turn turn_count, e.g. as it was undone"""
+        self.game.checkpoints.filter(turn_count__gte=turn_count).delete()
@@ -0,0 +1,457 @@
+import heapq
+import itertools
+import operator
+import string
+
+from scrabble.dawg_reader import HAS_LEAF_BIT
+from scrabble.dictionaries import registry
+from scrabble.engine.constants import BLANK_CHARS, BOARD_CONFIG, DL, DW, START, TILE_SCORES, TL, TW
+from scrabble.engine.rules import ScrabbleEngine
+from scrabble.gaddag import SEPARATOR
+from scrabble.gameplay.board_index import ALL_LETTERS_MASK, HORIZONTAL, LETTER_BITS, VERTICAL, BoardIndex
+
+# (letter, cross-check bit, tile, score) of the letter with each GADDAG label, None for non-letter labels
+LETTERS = [None] * 256
+for letter in string.ascii_lowercase:
+    LETTERS[ord(letter)] = (letter, LETTER_BITS[letter], letter.upper(), TILE_SCORES[letter.upper()])
+LETTER_MULTIPLIERS = {DL: 2, TL: 3}
+WORD_MULTIPLIERS = {DW: 2, START: 2, TW: 3}
+LETTER_MULTIPLIER_ROWS = [[LETTER_MULTIPLIERS.get(premium, 1) for premium in row] for row in BOARD_CONFIG]
+WORD_MULTIPLIER_ROWS = [[WORD_MULTIPLIERS.get(premium, 1) for premium in row] for row in BOARD_CONFIG]
+
+
+class BoardPass:
+    """Cell letters, face scores, cross-checks and anchors of the board in one orientation"""
+
+    def __init__(self, board, transposed):
+        size = len(board)
+        self.transposed = transposed
+        tiles = [[board[x][y] if transposed else board[y][x] for x in range(size)] for y in range(size)]
+        self.letters = [[tile[-1].lower() if tile else "" for tile in row] for row in tiles]
+        self.labels = [[ord(letter) if letter else 0 for letter in row] for row in self.letters]
+        self.scores = [[TILE_SCORES[tile[0]] if tile else 0 for tile in row] for row in tiles]
+
+    def coordinates(self, x, y):
+        """Returns board (x, y) coordinates for a square of this pass"""
+        return (y, x) if self.transposed else (x, y)
+
+
+class TopMoves:
+    """The limit highest scoring moves found so far, or all moves if limit is None"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.heap = []
+        self.sequence = itertools.count()
+        # Moves must score more than this to be kept
+        self.min_points = -1
+
+    def add(self, points, tiles, details):
+        entry = (points, next(self.sequence), tiles, details)
+        if self.limit is None:
+            # All moves are kept, so they're only sorted once all are found
+            self.heap.append(entry)
+            return
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, entry)
+        else:
+            heapq.heapreplace(self.heap, entry)
+        if len(self.heap) == self.limit:
+            self.min_points = self.heap[0][0]
+
+    def sorted(self):
+        """Returns (points, tiles, details) of each move, highest scoring and then first found first"""
+        # Sorting is stable, so moves of equal points stay in the order they were found
+        entries = sorted(self.heap, key=operator.itemgetter(1))
+        entries.sort(key=operator.itemgetter(0), reverse=True)
+        return [(points, tiles, details) for points, _, tiles, details in entries]
+
+
+class ScrabbleMoveGenerator:
+    """
+    Enumerates every legal Scrabble play for a rack, using anchors and cross-checks over the GADDAG.
+    Each play is generated once, from the leftmost anchor square it covers: the GADDAG is walked leftwards from
+    the anchor and any board letters touching its right, then rightwards after the separator.
+    Plays are scored with the rules of ScrabbleEngine.
+    Cross-checks and anchors come from board_index, e.g. the calculator's get_board_index(), or are built from board.
+    """
+    bingo_points = ScrabbleEngine.bingo_points
+    rack_size = ScrabbleEngine.rack_size
+    center = ScrabbleEngine.center
+
+    def __init__(self, board, dictionary_names, board_index=None):
+        self.board = board
+        self.size = len(board)
+        self.dictionary_names = dictionary_names
+        self.gaddag = registry.get_gaddag()
+        self.index = registry.get_index()
+        if self.gaddag is None or self.index is None or not self.index.covers(dictionary_names):
+            raise Exception("Move generation requires the GADDAG and combined dictionary index")
+        self.mask = self.index.get_mask(dictionary_names)
+        self.board_index = board_index or BoardIndex.build(board, dictionary_names)
+        self.is_first_play = all(all(square == "" for square in row) for row in board)
+        # Each main word formed, in capitals if it's in the game's dictionaries and otherwise empty
+        self.valid_words = {}
+
+    def generate(self, rack, limit=10):
+        """
+        Returns up to limit plays (all plays if limit is None) with the highest scores, as dicts of
+        "tiles" (in the format of GameTurnSerializer played_tiles, blanks as e.g. "-A"), "words" and "points".
+        """
+        counts = {letter: 0 for letter in string.ascii_lowercase}
+        blanks = []
+        for tile in rack:
+            if tile in BLANK_CHARS:
+                blanks.append(tile)
+            else:
+                counts[tile.lower()] += 1
+        top_moves = TopMoves(limit)
+        # The highest face score of a rack tile, bounding the points of any tile still to be placed
+        face = max((TILE_SCORES[letter.upper()] for letter, count in counts.items() if count), default=0)
+        board_passes = {}
+        for transposed in (False, True):
+            board_pass = board_passes[transposed] = BoardPass(self.board, transposed)
+            self._add_cross_checks(board_pass)
+            if limit is not None:
+                board_pass.reach = [self._get_reach(board_pass, y, face) for y in range(self.size)]
+            for y in range(self.size):
+                for x in range(self.size):
+                    if board_pass.anchors[y][x]:
+                        self._generate_from_anchor(board_pass, x, y, counts, blanks, top_moves)
+        moves = []
+        for points, tiles, (transposed, word) in top_moves.sorted():
+            board_pass = board_passes[transposed]
+            # Tiles are placed along one row of the pass
+            tiles = sorted(tiles)
+            played_tiles = []
+            for x, y, tile in tiles:
+                board_x, board_y = board_pass.coordinates(x, y)
+                played_tiles.append({"tile": tile, "x": board_x, "y": board_y})
+            moves.append({"tiles": played_tiles, "words": self.get_words(board_pass, tiles, word), "points": points})
+        return moves
+
+    def _add_cross_checks(self, board_pass):
+        """
+        For each empty square, finds the letters which form a valid perpendicular word, that word's score without the
+        new tile and its letters before and after the square (None if there is no perpendicular word), and whether it
+        is an anchor.
+        """
+        size = self.size
+        letters = board_pass.letters
+        board_pass.allowed = [[ALL_LETTERS_MASK] * size for _ in range(size)]
+        board_pass.cross_scores = [[None] * size for _ in range(size)]
+        board_pass.cross_parts = [[None] * size for _ in range(size)]
+        board_pass.anchors = [[False] * size for _ in range(size)]
+        if self.is_first_play:
+            # The center square is the only anchor of the first play
+            x, y = self.center
+            board_pass.anchors[y][x] = True
+            return
+        cross_checks = self.board_index.cross_checks[VERTICAL if board_pass.transposed else HORIZONTAL]
+        for y in range(size):
+            for x in range(size):
+                if letters[y][x]:
+                    continue
+                board_x, board_y = board_pass.coordinates(x, y)
+                board_pass.anchors[y][x] = self.board_index.connected[board_y][board_x]
+                mask = cross_checks[board_y][board_x]
+                if mask is None:
+                    continue
+                board_pass.allowed[y][x] = mask
+                top = y
+                while top > 0 and letters[top - 1][x]:
+                    top -= 1
+                bottom = y
+                while bottom < size - 1 and letters[bottom + 1][x]:
+                    bottom += 1
+                board_pass.cross_scores[y][x] = sum(board_pass.scores[i][x] for i in range(top, bottom + 1) if i != y)
+                board_pass.cross_parts[y][x] = (
+                    "".join(letters[i][x] for i in range(top, y)).upper(),
+                    "".join(letters[i][x] for i in range(y + 1, bottom + 1)).upper(),
+                )
+
+    def _get_reach(self, board_pass, y, face):
+        """
+        For each square x of row y, returns upper bounds on what playing k more tiles from x onwards can add to a
+        play's main word points, word multiplier and perpendicular word points, as (rightwards, leftwards) lists of
+        ([(main_points, word_multiplier, cross_points) for each k], count of empty squares reachable).
+        Leftwards stops before an empty anchor, as plays covering it are generated from that anchor.
+        """
+        size = self.size
+        letters = board_pass.letters[y]
+        scores = board_pass.scores[y]
+        cross_scores = board_pass.cross_scores[y]
+        anchors = board_pass.anchors[y]
+        letter_multipliers = LETTER_MULTIPLIER_ROWS[y]
+        word_multipliers = WORD_MULTIPLIER_ROWS[y]
+        reach = ([], [])
+        for leftwards, squares in ((False, lambda x: range(x, size)), (True, lambda x: range(x, -1, -1))):
+            for x in range(size):
+                bounds = []
+                main_points, word_multiplier, cross_points = 0, 1, 0
+                for i in squares(x):
+                    if letters[i]:
+                        main_points += scores[i]
+                        continue
+                    if leftwards and i != x and anchors[i] or len(bounds) > self.rack_size:
+                        break
+                    # Playing len(bounds) tiles can't reach square i
+                    bounds.append((main_points, word_multiplier, cross_points))
+                    points = face * letter_multipliers[i]
+                    main_points += points
+                    word_multiplier *= word_multipliers[i]
+                    if cross_scores[i] is not None:
+                        cross_points += (cross_scores[i] + points) * word_multipliers[i]
+                empty_squares = len(bounds)
+                while len(bounds) <= self.rack_size:
+                    bounds.append((main_points, word_multiplier, cross_points))
+                reach[leftwards].append((bounds, empty_squares))
+        return reach
+
+    def _generate_from_anchor(self, board_pass, anchor_x, y, counts, blanks, top_moves):
+        size = self.size
+        letters = board_pass.letters[y]
+        scores = board_pass.scores[y]
+        allowed = board_pass.allowed[y]
+        cross_scores = board_pass.cross_scores[y]
+        anchors = board_pass.anchors[y]
+        labels = board_pass.labels[y]
+        # The board is symmetric, so row y of the transposed board has the premiums of row y
+        letter_multipliers = LETTER_MULTIPLIER_ROWS[y]
+        word_multipliers = WORD_MULTIPLIER_ROWS[y]
+        follow = self.gaddag.follow
+        child_offset = self.gaddag.child_offset
+        units = self.gaddag.units
+        guide = self.gaddag.guide
+        rack_size = self.rack_size
+        rack_letters = {letter for letter, count in counts.items() if count}
+        rack_total = sum(counts.values()) + len(blanks)
+        # Words through the anchor take in the board letters right of it, so the walk starts from the last of them
+        # and follows them leftwards before placing tiles, rather than finding they don't fit after the separator
+        right_x = anchor_x + 1
+        while right_x < size and labels[right_x]:
+            right_x += 1
+        node = self.gaddag.ROOT
+        for x in range(right_x - 1, anchor_x, -1):
+            node = follow(node, labels[x])
+            if node is None:
+                return
+        start_score = sum(scores[anchor_x + 1:right_x])
+        if top_moves.limit is not None:
+            reach_rightwards, reach_leftwards = board_pass.reach[y]
+            anchor_bounds, anchor_empty_squares = reach_rightwards[right_x] if right_x < size else ([], 0)
+        placed = []
+        # The letters of the row, with the tiles placed
+        row = list(letters)
+        valid_words = self.valid_words
+        # Blanks placed for letters also in the rack, which could take the squares of that letter's tiles instead
+        swappable_blanks = 0
+
+        def beaten(x, leftwards, main_score, word_multiplier, cross_total):
+            """
+            Returns whether even the rack's highest scoring tile on each square in reach from empty square x can't beat
+            the limit moves found. Swapping a placed blank with a placed tile isn't bounded by this.
+            """
+            tiles_left = rack_total - len(placed)
+            if leftwards:
+                bounds, empty_squares = reach_leftwards[x]
+                main_points, square_word_multiplier, cross_points = bounds[tiles_left]
+                if anchor_bounds:
+                    empty_squares += anchor_empty_squares
+                    right_main_points, right_word_multiplier, right_cross_points = anchor_bounds[tiles_left]
+                    main_points += right_main_points
+                    square_word_multiplier *= right_word_multiplier
+                    cross_points += right_cross_points
+            else:
+                bounds, empty_squares = reach_rightwards[x]
+                main_points, square_word_multiplier, cross_points = bounds[tiles_left]
+            points = (main_score + main_points) * word_multiplier * square_word_multiplier + cross_total + cross_points
+            if rack_total == rack_size and empty_squares >= tiles_left:
+                points += self.bingo_points
+            return points <= top_moves.min_points
+
+        def place(x, node):
+            """
+            Places each rack tile which can follow node on empty square x in turn, yielding the child node and the
+            main word points, word multiplier and perpendicular word points of the tile
+            """
+            nonlocal swappable_blanks
+            letter_multiplier = letter_multipliers[x]
+            square_word_multiplier = word_multipliers[x]
+            cross_score = cross_scores[x]
+            mask = allowed[x]
+            offset = child_offset(node)
+            # Walk the children of node through the guide, in label order
+            label = guide[node * 2]
+            while label:
+                child = offset ^ label
+                letter_entry = LETTERS[label]
+                label = guide[child * 2 + 1]
+                if letter_entry is None:
+                    continue
+                letter, bit, upper_letter, score = letter_entry
+                if not mask & bit:
+                    continue
+                # Use real tiles before blanks. Which of a letter's squares the blanks take is chosen in finish.
+                if counts[letter]:
+                    counts[letter] -= 1
+                    tile = upper_letter
+                    letter_score = score * letter_multiplier
+                elif blanks:
+                    tile = blanks.pop() + upper_letter
+                    letter_score = 0
+                    if letter in rack_letters:
+                        swappable_blanks += 1
+                else:
+                    continue
+                cross_points = 0
+                if cross_score is not None:
+                    cross_points = (cross_score + letter_score) * square_word_multiplier
+                placed.append((x, y, tile))
+                row[x] = letter
+                yield child, letter_score, square_word_multiplier, cross_points
+                row[x] = ""
+                placed.pop()
+                if len(tile) == 1:
+                    counts[letter] += 1
+                else:
+                    blanks.append(tile[0])
+                    if letter in rack_letters:
+                        swappable_blanks -= 1
+
+        def extend_left(x, node, main_score, word_multiplier, cross_total):
+            """Places tiles on empty square x, the anchor or left of it, then the squares left and right of the play"""
+            if top_moves.min_points >= 0 and not swappable_blanks and beaten(
+                x, True, main_score, word_multiplier, cross_total
+            ):
+                return
+            for child, letter_score, square_word_multiplier, cross_points in place(x, node):
+                tile_main_score = main_score + letter_score
+                tile_word_multiplier = word_multiplier * square_word_multiplier
+                tile_cross_total = cross_total + cross_points
+                # Follow the board letters left of the tile, so start_x is the leftmost square of the play so far
+                start_x = x
+                while child is not None and start_x > 0 and labels[start_x - 1]:
+                    start_x -= 1
+                    child = follow(child, labels[start_x])
+                    tile_main_score += scores[start_x]
+                if child is None:
+                    continue
+                # Switch to extending rightwards, from the first empty square right of the anchor
+                separator_node = follow(child, SEPARATOR)
+                if separator_node is not None:
+                    if units[separator_node] & HAS_LEAF_BIT:
+                        finish(start_x, right_x - 1, tile_main_score, tile_word_multiplier, tile_cross_total)
+                    if right_x < size and len(placed) < rack_size:
+                        extend_right(
+                            right_x, separator_node, start_x, tile_main_score, tile_word_multiplier, tile_cross_total
+                        )
+                # Plays covering an anchor further left are generated from that anchor
+                if start_x > 0 and not anchors[start_x - 1] and len(placed) < rack_size:
+                    extend_left(start_x - 1, child, tile_main_score, tile_word_multiplier, tile_cross_total)
+
+        def extend_right(x, node, start_x, main_score, word_multiplier, cross_total):
+            """Places tiles on empty square x, right of the anchor, then the squares right of the play"""
+            if top_moves.min_points >= 0 and not swappable_blanks and beaten(
+                x, False, main_score, word_multiplier, cross_total
+            ):
+                return
+            for child, letter_score, square_word_multiplier, cross_points in place(x, node):
+                tile_main_score = main_score + letter_score
+                tile_word_multiplier = word_multiplier * square_word_multiplier
+                tile_cross_total = cross_total + cross_points
+                # Follow the board letters right of the tile, so end_x is the rightmost square of the play
+                end_x = x
+                while child is not None and end_x + 1 < size and labels[end_x + 1]:
+                    end_x += 1
+                    child = follow(child, labels[end_x])
+                    tile_main_score += scores[end_x]
+                if child is None:
+                    continue
+                if units[child] & HAS_LEAF_BIT:
+                    finish(start_x, end_x, tile_main_score, tile_word_multiplier, tile_cross_total)
+                if end_x + 1 < size and len(placed) < rack_size:
+                    extend_right(end_x + 1, child, start_x, tile_main_score, tile_word_multiplier, tile_cross_total)
+
+        def finish(start_x, end_x, main_score, word_multiplier, cross_total):
+            if end_x == start_x:
+                return
+            if self.is_first_play and len(placed) < 2:
+                return
+            # A single tile with a perpendicular word is generated by the pass in that direction
+            if board_pass.transposed and len(placed) == 1 and cross_scores[placed[0][0]] is not None:
+                return
+            points = main_score * word_multiplier + cross_total
+            if len(placed) == rack_size:
+                points += self.bingo_points
+            # Moving a blank onto another square of its letter can score more
+            if points <= top_moves.min_points and not swappable_blanks:
+                return
+            # The GADDAG holds the words of all dictionaries, check the main word is in the game's dictionaries
+            word = "".join(row[start_x:end_x + 1])
+            main_word = valid_words.get(word)
+            if main_word is None:
+                values = self.index.dawg.get(word)
+                main_word = valid_words[word] = word.upper() if values and values[0][0] & self.mask else ""
+            if not main_word:
+                return
+            # Moves hold only tuples of strings and numbers, which the garbage collector stops tracking
+            details = (board_pass.transposed, main_word)
+            if not swappable_blanks:
+                top_moves.add(points, tuple(placed), details)
+                return
+            for points, tiles in get_blank_moves(points, word_multiplier):
+                if points > top_moves.min_points:
+                    top_moves.add(points, tuple(tiles), details)
+
+        def get_blank_moves(points, word_multiplier):
+            """
+            Returns (points, tiles) of the placed tiles with each choice of squares for the blanks among the squares
+            of the letters they stand for. A blank only stands for a letter once the rack's tiles of it are used, as
+            keeping a tile and playing a blank for it scores less.
+            """
+            # Indexes of the placed tiles of each letter played with a blank
+            blank_letters = {tile[-1] for _, _, tile in placed if len(tile) > 1 and tile[-1].lower() in rack_letters}
+            letter_indexes = {}
+            for i, (_, _, tile) in enumerate(placed):
+                if tile[-1] in blank_letters:
+                    letter_indexes.setdefault(tile[-1], []).append(i)
+            choices = []
+            for letter, indexes in letter_indexes.items():
+                blank_indexes = [i for i in indexes if len(placed[i][2]) > 1]
+                choices.append([(letter, indexes, blank_indexes, chosen) for chosen in itertools.combinations(
+                    indexes, len(blank_indexes)
+                )])
+            moves = []
+            for choice in itertools.product(*choices):
+                tiles = list(placed)
+                move_points = points
+                for letter, indexes, blank_indexes, chosen in choice:
+                    blank_tiles = (placed[i][2] for i in blank_indexes)
+                    for i in indexes:
+                        x = placed[i][0]
+                        # A letter's points count in the main word, and in the perpendicular word if there is one
+                        multiplier = word_multiplier
+                        if cross_scores[x] is not None:
+                            multiplier += word_multipliers[x]
+                        points_as_tile = TILE_SCORES[letter] * letter_multipliers[x] * multiplier
+                        if i in chosen:
+                            tiles[i] = (x, y, next(blank_tiles))
+                            move_points -= 0 if i in blank_indexes else points_as_tile
+                        else:
+                            tiles[i] = (x, y, letter)
+                            move_points += points_as_tile if i in blank_indexes else 0
+                moves.append((move_points, tiles))
+            return moves
+
+        extend_left(anchor_x, node, start_score, 1, 0)
+
+    def get_words(self, board_pass, tiles, word):
+        """Returns the main word and the perpendicular words formed by (x, y, tile) tiles along row y of board_pass"""
+        words = [word]
+        cross_parts = board_pass.cross_parts[tiles[0][1]]
+        for x, _, tile in tiles:
+            if cross_parts[x]:
+                before, after = cross_parts[x]
+                words.append(before + tile[-1] + after)
+        return words
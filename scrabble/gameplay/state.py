@@ -0,0 +1,53 @@
+from scrabble.constants import TurnAction
+from scrabble.models import GameTurn
+
+
+def get_game_state(game, game_player, since=None):
+    """
+    Returns the game as seen by game_player at its current version. Given an earlier version as since, only the
+    squares and turns changed after it are included, along with the turn counts of turns undone after it. Otherwise
+    the state is full, with all occupied squares and turns.
+    Squares are [x, y, square], an empty square being "".
+    """
+    full = since is None or not 0 <= since <= game.version
+    turns = GameTurn.objects.filter(game_player__game_id=game.id).order_by("turn_count").values_list(
+        "turn_count", "game_player__turn_index", "turn_action", "score", "turn_words", "turn_data", "deleted"
+    )
+    if full:
+        turns = turns.filter(deleted=False)
+    else:
+        turns = turns.filter(version__gt=since)
+    turn_log = []
+    undone = []
+    changed_squares = set()
+    for turn_count, turn_index, action, score, words, turn_data, deleted in turns:
+        tiles = [[tile["x"], tile["y"], tile["tile"]] for tile in turn_data["played_tiles"]] \
+            if action == TurnAction.play else []
+        changed_squares.update((x, y) for x, y, _ in tiles)
+        if deleted:
+            undone.append(turn_count)
+        else:
+            # Exchanged tiles aren't shown to other players
+            turn_log.append(
+                {"turn": turn_count, "player": turn_index, "action": action, "score": score, "words": words or [],
+                 "tiles": tiles}
+            )
+    board = game.board
+    if full:
+        squares = [[x, y, square] for y, row in enumerate(board) for x, square in enumerate(row) if square]
+    else:
+        squares = [[x, y, board[y][x]] for x, y in sorted(changed_squares, key=lambda square: (square[1], square[0]))]
+    return {
+        "version": game.version,
+        "full": full,
+        "squares": squares,
+        "turns": turn_log,
+        "undone": undone,
+        "turn_count": game.turn_count,
+        "players": game.get_player_display(),
+        "scores": list(game.racks.order_by("turn_index").values_list("score", flat=True)),
+        "rack": game_player.rack,
+        "next_turn_index": game.next_turn_index,
+        "bag_size": len(game.letter_bag),
+        "over": game.over,
+    }
@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+from django.db.models import Case, Count, F, Func, Max, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Length
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from common.models import User
+from scrabble.constants import TurnAction
+from scrabble.models import GamePlayer, GameTurn, UserStatistics
+
+COUNT_FIELDS = ["play_count", "play_score_sum", "games_played", "games_won", "game_score_sum"]
+MAX_FIELDS = ["play_score_max", "game_score_max"]
+
+
+class StatisticsUpdate:
+    """
+    Changes to the UserStatistics of players from new plays and finished games, written with one query.
+    Undone turns and archived games can lower maximums, so their players' statistics are rebuilt instead.
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.maximums = defaultdict(dict)
+        self.longest_words = {}
+
+    def add_play(self, user_id, score, words):
+        self.counts[user_id]["play_count"] += 1
+        self.counts[user_id]["play_score_sum"] += score
+        self._update_max(user_id, "play_score_max", score)
+        for word in words or []:
+            if len(word) > len(self.longest_words.get(user_id, "")):
+                self.longest_words[user_id] = word
+
+    def add_game(self, user_id, score, winner):
+        self.counts[user_id]["games_played"] += 1
+        self.counts[user_id]["games_won"] += int(winner)
+        self.counts[user_id]["game_score_sum"] += score
+        self._update_max(user_id, "game_score_max", score)
+
+    def _update_max(self, user_id, field, value):
+        self.maximums[user_id][field] = max(value, self.maximums[user_id].get(field, value))
+
+    def save(self):
+        """Adds the changes to the saved statistics, rebuilding those of users who don't have any yet"""
+        if not self.counts:
+            return
+        whens = defaultdict(list)
+        for user_id, counts in self.counts.items():
+            for field, value in counts.items():
+                whens[field].append(When(user_id=user_id, then=F(field) + value))
+            for field, value in self.maximums[user_id].items():
+                whens[field].append(When(user_id=user_id, then=Greatest(F(field), Value(value))))
+            if user_id in self.longest_words:
+                word = self.longest_words[user_id]
+                longer = Case(
+                    When(LessThan(Length("longest_word"), len(word)), then=Value(word)), default=F("longest_word")
+                )
+                whens["longest_word"].append(When(user_id=user_id, then=longer))
+        updates = {field: Case(*field_whens, default=F(field)) for field, field_whens in whens.items()}
+        updated = UserStatistics.objects.filter(user_id__in=self.counts).update(updated_on=timezone.now(), **updates)
+        if updated < len(self.counts):
+            saved = set(UserStatistics.objects.filter(user_id__in=self.counts).values_list("user_id", flat=True))
+            rebuild_statistics([user_id for user_id in self.counts if user_id not in saved])
+
+
+def rebuild_statistics(user_ids=None):
+    """Recalculates the UserStatistics of the given users, or of all users, from their turns and finished games"""
+    plays = GameTurn.objects.filter(
+        turn_action=TurnAction.play, deleted=False, game_player__game__archived_on__isnull=True
+    )
+    games = GamePlayer.objects.filter(game__over=True, game__archived_on__isnull=True)
+    users = User.objects.all()
+    if user_ids is not None:
+        plays = plays.filter(game_player__user_id__in=user_ids)
+        games = games.filter(user_id__in=user_ids)
+        users = users.filter(id__in=user_ids)
+    statistics = {user_id: UserStatistics(user_id=user_id) for user_id in users.values_list("id", flat=True)}
+    play_totals = plays.values("game_player__user_id").annotate(
+        play_count=Count("id"), play_score_sum=Sum("score"), play_score_max=Max("score")
+    )
+    game_totals = games.values("user_id").annotate(
+        games_played=Count("id"),
+        games_won=Count("id", filter=Q(winner=True)),
+        game_score_sum=Sum("score"),
+        game_score_max=Max("score"),
+    )
+    longest_words = (
+        plays.annotate(word=Func(F("turn_words"), function="unnest"))
+        .order_by("game_player__user_id", Length("word").desc())
+        .distinct("game_player__user_id")
+        .values_list("game_player__user_id", "word")
+    )
+    for totals in play_totals:
+        user_id = totals.pop("game_player__user_id")
+        for field, value in totals.items():
+            setattr(statistics[user_id], field, value)
+    for totals in game_totals:
+        user_id = totals.pop("user_id")
+        for field, value in totals.items():
+            setattr(statistics[user_id], field, value)
+    for user_id, word in longest_words:
+        statistics[user_id].longest_word = word or ""
+    UserStatistics.objects.bulk_create(
+        statistics.values(),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["longest_word", *COUNT_FIELDS, *MAX_FIELDS, "updated_on"],
+    )
@@ -0,0 +1,222 @@
+import string
+
+from scrabble.dictionaries import registry
+from scrabble.engine.rules import (
+    CENTER_SQUARES, MAX_STACK_HEIGHT, UpwordsEngine, get_tile_letters, get_word_points, is_duplicate_tile
+)
+from scrabble.gameplay.board_index import ALL_LETTERS_MASK, HORIZONTAL, LETTER_BITS, VERTICAL
+from scrabble.gameplay.scrabble_move_generator import TopMoves
+from scrabble.gameplay.upwords_gameplay import UpwordsBoardIndex
+
+LETTER_LABELS = {ord(letter): letter for letter in string.ascii_lowercase}
+U_LABEL = ord("u")
+
+
+class BoardPass:
+    """Stacks, cross-checks and cross word points of the board in one orientation"""
+
+    def __init__(self, board, transposed):
+        size = len(board)
+        self.transposed = transposed
+        self.stacks = [[board[x][y] if transposed else board[y][x] for x in range(size)] for y in range(size)]
+
+    def coordinates(self, x, y):
+        """Returns board (x, y) coordinates for a square of this pass"""
+        return (y, x) if self.transposed else (x, y)
+
+
+class UpwordsMoveGenerator:
+    """
+    Enumerates every legal Upwords play for a rack, with the rules and scoring of UpwordsEngine.
+    Each row is walked from every square which can start a word, following the combined dictionary index so only
+    word prefixes are explored. Each square of the word keeps its top tile or has a rack tile stacked on it.
+    Cross-checks come from board_index, e.g. the calculator's get_board_index(), or are built from board.
+    """
+    bingo_points = UpwordsEngine.bingo_points
+    rack_size = UpwordsEngine.rack_size
+
+    def __init__(self, board, dictionary_names, prevent_stack_duplicates=False, board_index=None):
+        self.board = board
+        self.size = len(board)
+        self.dictionary_names = dictionary_names
+        self.prevent_stack_duplicates = prevent_stack_duplicates
+        self.index = registry.get_index()
+        if self.index is None or not self.index.covers(dictionary_names):
+            raise Exception("Move generation requires the combined dictionary index")
+        self.mask = self.index.get_mask(dictionary_names)
+        self.board_index = board_index or UpwordsBoardIndex.build(board, dictionary_names)
+        self.is_first_play = all(all(square == "" for square in row) for row in board)
+
+    def generate(self, rack, limit=10):
+        """
+        Returns up to limit plays (all plays if limit is None) with the highest scores, as dicts of
+        "tiles" (in the format of GameTurnSerializer played_tiles), "words" and "points".
+        """
+        counts = {letter: 0 for letter in string.ascii_lowercase}
+        for tile in rack:
+            counts[tile.lower()] += 1
+        top_moves = TopMoves(limit)
+        for transposed in (False, True):
+            board_pass = BoardPass(self.board, transposed)
+            self._add_cross_checks(board_pass)
+            for y in range(self.size):
+                for x in range(self.size):
+                    # Words start at the edge or after an empty square
+                    if x == 0 or not board_pass.stacks[y][x - 1]:
+                        self._generate_from_start(board_pass, x, y, counts, top_moves)
+        moves = []
+        for points, tiles, board_pass in top_moves.sorted():
+            played_tiles = []
+            for x, y, tile in tiles:
+                board_x, board_y = board_pass.coordinates(x, y)
+                played_tiles.append({"tile": tile, "x": board_x, "y": board_y})
+            moves.append({"tiles": played_tiles, "words": self.get_words(played_tiles), "points": points})
+        return moves
+
+    def _add_cross_checks(self, board_pass):
+        """
+        For each square, finds the letters which can be played on it to form a valid perpendicular word, that word's
+        points without and with a Q tile played (None if there is no perpendicular word), and whether a tile played on
+        it connects to the board.
+        """
+        size = self.size
+        stacks = board_pass.stacks
+        board_pass.allowed = [[ALL_LETTERS_MASK] * size for _ in range(size)]
+        board_pass.cross_points = [[None] * size for _ in range(size)]
+        board_pass.connected = [[False] * size for _ in range(size)]
+        cross_checks = self.board_index.cross_checks[VERTICAL if board_pass.transposed else HORIZONTAL]
+        for y in range(size):
+            for x in range(size):
+                board_x, board_y = board_pass.coordinates(x, y)
+                board_pass.connected[y][x] = self.board_index.connected[board_y][board_x]
+                mask = cross_checks[board_y][board_x]
+                if mask is None:
+                    continue
+                board_pass.allowed[y][x] = mask
+                top = y
+                while top > 0 and stacks[top - 1][x]:
+                    top -= 1
+                bottom = y
+                while bottom < size - 1 and stacks[bottom + 1][x]:
+                    bottom += 1
+                heights = [len(stacks[i][x]) for i in range(top, bottom + 1) if i != y]
+                has_q = any(stacks[i][x][0] == "Q" for i in range(top, bottom + 1) if i != y)
+                heights.append(len(stacks[y][x]) + 1)
+                board_pass.cross_points[y][x] = (get_word_points(heights, has_q), get_word_points(heights, True))
+
+    def _generate_from_start(self, board_pass, start_x, y, counts, top_moves):
+        size = self.size
+        stacks = board_pass.stacks[y]
+        allowed = board_pass.allowed[y]
+        cross_points = board_pass.cross_points[y]
+        connected = board_pass.connected[y]
+        reader = self.index.reader
+        follow = reader.follow
+        children = reader.children
+        get_node_mask = self.index.get_node_mask
+        mask = self.mask
+        rack_size = self.rack_size
+        prevent_stack_duplicates = self.prevent_stack_duplicates
+        # Rack tiles played as (x, tile), and the top tile of each square of the word after the play
+        placed = []
+        word_tiles = []
+
+        def walk(x, node, cross_total):
+            # Squares start_x to x - 1 are filled, spelling the prefix which reached node
+            if x == size or not stacks[x]:
+                if x - start_x > 1 and placed and get_node_mask(node) & mask:
+                    finish(x, cross_total)
+                if x == size or len(placed) == rack_size:
+                    return
+            stack = stacks[x]
+            if stack:
+                # Keep the top tile
+                child = follow_tile(node, stack[0])
+                if child is not None:
+                    word_tiles.append(stack[0])
+                    walk(x + 1, child, cross_total)
+                    word_tiles.pop()
+                if len(stack) >= MAX_STACK_HEIGHT or len(placed) == rack_size:
+                    return
+            letter_mask = allowed[x]
+            square_cross_points = cross_points[x]
+            for label, child in children(node):
+                letter = LETTER_LABELS.get(label)
+                if letter is None or not counts[letter] or not letter_mask & LETTER_BITS[letter]:
+                    continue
+                tile = letter.upper()
+                if stack and is_duplicate_tile(tile, stack, prevent_stack_duplicates):
+                    continue
+                if tile == "Q":
+                    child = follow(child, U_LABEL)
+                    if child is None:
+                        continue
+                points = 0
+                if square_cross_points is not None:
+                    points = square_cross_points[tile == "Q"]
+                counts[letter] -= 1
+                placed.append((x, tile))
+                word_tiles.append(tile)
+                walk(x + 1, child, cross_total + points)
+                word_tiles.pop()
+                placed.pop()
+                counts[letter] += 1
+
+        def follow_tile(node, tile):
+            for letter in get_tile_letters(tile).lower():
+                node = follow(node, ord(letter))
+                if node is None:
+                    return None
+            return node
+
+        def finish(end_x, cross_total):
+            if self.is_first_play:
+                if len(placed) < 2 or not any(board_pass.coordinates(x, y) in CENTER_SQUARES for x, _ in placed):
+                    return
+            elif not any(connected[x] for x, _ in placed):
+                return
+            # A single tile with a perpendicular word is generated by the pass in that direction
+            if board_pass.transposed and len(placed) == 1 and cross_points[placed[0][0]] is not None:
+                return
+            # Can't cover a whole word
+            if len(placed) == end_x - start_x and any(stacks[x] and stacks[x + 1] for x in range(start_x, end_x - 1)):
+                return
+            placed_xs = {x for x, _ in placed}
+            heights = [len(stacks[x]) + (x in placed_xs) for x in range(start_x, end_x)]
+            points = get_word_points(heights, "Q" in word_tiles) + cross_total
+            if len(placed) == rack_size:
+                points += self.bingo_points
+            if points > top_moves.min_points:
+                top_moves.add(points, [(x, y, tile) for x, tile in placed], board_pass)
+
+        walk(start_x, reader.ROOT, 0)
+
+    def get_words(self, played_tiles):
+        """Returns the words formed by played_tiles, main word first"""
+        played = {(tile["x"], tile["y"]): tile["tile"] for tile in played_tiles}
+
+        def tile_at(x, y):
+            if (x, y) in played:
+                return played[(x, y)]
+            return self.board[y][x][:1]
+
+        def word_through(x, y, dx, dy):
+            while 0 <= x - dx and 0 <= y - dy and tile_at(x - dx, y - dy):
+                x, y = x - dx, y - dy
+            tiles = []
+            while x < self.size and y < self.size and tile_at(x, y):
+                tiles.append(tile_at(x, y))
+                x, y = x + dx, y + dy
+            return "".join(get_tile_letters(tile) for tile in tiles) if len(tiles) > 1 else ""
+
+        first = played_tiles[0]
+        vertical = len(played_tiles) > 1 and played_tiles[0]["x"] == played_tiles[1]["x"]
+        if len(played_tiles) == 1 and not word_through(first["x"], first["y"], 1, 0):
+            vertical = True
+        direction, cross_direction = ((0, 1), (1, 0)) if vertical else ((1, 0), (0, 1))
+        words = [word_through(first["x"], first["y"], *direction)]
+        for tile in played_tiles:
+            cross_word = word_through(tile["x"], tile["y"], *cross_direction)
+            if cross_word:
+                words.append(cross_word)
+        return words
@@ -1,4 +1,4 @@
-from statistics import fmean
+import random
 
 from django.conf import settings
 from django.contrib import messages
@@ -16,8 +16,9 @@ from common.models import User, Notification
 from common.notifications import create_notification
 from scrabble.constants import WordGame, TurnAction
 from scrabble.gameplay.scrabble_gameplay import ScrabbleCalculator
+from scrabble.gameplay.statistics import rebuild_statistics
 from scrabble.gameplay.upwords_gameplay import UpwordsCalculator
-from scrabble.models import GamePlayer, GameTurn
+from scrabble.models import GamePlayer, UserStatistics
 
 
 def send_invitation_email(user, game, creating_user, request):
@@ -67,7 +68,9 @@ def create_new_game(form, request):
 def start_game(game, users, request):
     calculator = get_calculator(game)
     game.board = calculator.get_initial_board()
-    game.letter_bag = calculator.get_initial_letter_bag()
+    game.bag_counts = calculator.get_initial_letter_bag().counts
+    # Seed the bag so the game's draws can be reproduced, see ScrabbleGame.draw_tiles
+    game.bag_seed = random.getrandbits(62)
     game.save()
     players = []
     for user in users:
@@ -148,24 +151,21 @@ def send_game_over_notification(game, request):
 
 def get_user_statistics(user):
     stats = {}
-    all_plays = GameTurn.objects.filter(game_player__user=user, turn_action=TurnAction.play).exclude(game_player__game__archived_on__isnull=False)
-    if all_plays:
-        scores = all_plays.values_list("score", flat=True)
-        all_words = [word for turn in all_plays for word in turn.turn_words if word]
-        longest_word = sorted(all_words, key=lambda x: len(x), reverse=True)[0]
+    statistics = UserStatistics.objects.filter(user=user).first()
+    if statistics is None:
+        rebuild_statistics([user.id])
+        statistics = UserStatistics.objects.get(user=user)
+    if statistics.play_count:
         stats.update({
-            "longest word": longest_word,
-            "highest play score": max(scores),
-            "average play score": round(fmean(scores)),
+            "longest word": statistics.longest_word,
+            "highest play score": statistics.play_score_max,
+            "average play score": round(statistics.play_score_sum / statistics.play_count),
         })
-    game_results = user.completed_games()
-    if game_results:
-        game_scores = game_results.values_list("score", flat=True)
-        won_games = game_results.filter(winner=True).count()
+    if statistics.games_played:
         stats.update({
-            "highest game score": max(game_scores),
-            "average game score": round(fmean(game_scores)),
-            "percent wins": f"{round(won_games / len(game_results) * 100)}%",
+            "highest game score": statistics.game_score_max,
+            "average game score": round(statistics.game_score_sum / statistics.games_played),
+            "percent wins": f"{round(statistics.games_won / statistics.games_played * 100)}%",
         })
     return stats
 
@@ -173,4 +173,6 @@ def get_user_statistics(user):
 def archive_game(game_player):
     with transaction.atomic():
         game_player.update(archived=True)
-        game_player.game.update(over=True, archived_on=timezone.now())
\ No newline at end of file
+        game_player.game.update(over=True, archived_on=timezone.now())
+        # Archived games don't count towards statistics
+        rebuild_statistics(game_player.game.racks.values_list("user_id", flat=True))
\ No newline at end of file
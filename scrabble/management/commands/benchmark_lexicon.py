@@ -0,0 +1,101 @@
+import os
+import random
+import string
+import time
+
+from django.core.management import BaseCommand
+
+from scrabble.constants import Dictionary
+from scrabble.dictionaries import (
+    COMBINED_INDEX_NAME, CombinedIndex, get_dictionary_path, load_dawg
+)
+from scrabble.engine.board import GameBoard
+from scrabble.engine.rules import ScrabbleEngine
+from scrabble.gaddag import GADDAG_NAME, Gaddag
+from scrabble.gameplay.scrabble_gameplay import SCRABBLE_TILE_FREQUENCIES
+from scrabble.gameplay.scrabble_move_generator import ScrabbleMoveGenerator
+
+
+class Command(BaseCommand):
+    help = "Compares size, load time and lookup speed of the dictionary DAWGs, combined index and GADDAG, " \
+        "and times move generation on a mid-game board"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--turns', type=int, default=8)
+        parser.add_argument('--rack', default="AE-*RST")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        dictionary_names = [Dictionary.ospd2, Dictionary.ospd3, Dictionary.ospd4, Dictionary.long]
+
+        dawgs, dawgs_load_time = self.timed(lambda: [load_dawg(name) for name in dictionary_names])
+        index, index_load_time = self.timed(CombinedIndex.load)
+        gaddag, gaddag_load_time = self.timed(Gaddag, get_dictionary_path(GADDAG_NAME))
+        self.stdout.write("Size and load time:")
+        self.report("dictionary DAWGs", sum(os.path.getsize(get_dictionary_path(name)) for name in dictionary_names),
+                    dawgs_load_time)
+        self.report("combined index", os.path.getsize(get_dictionary_path(COMBINED_INDEX_NAME)), index_load_time)
+        self.report("GADDAG", os.path.getsize(get_dictionary_path(GADDAG_NAME)), gaddag_load_time)
+
+        # Half real words, half the same words with one letter changed
+        words = rng.sample(index.dawg.keys(), options["lookups"] // 2)
+        words += [self.mutate(word, rng) for word in words]
+        rng.shuffle(words)
+        self.stdout.write(f"Membership lookups ({len(words)} words):")
+        self.report_lookups("dictionary DAWGs", words, lambda word: any(word in d for d in dawgs))
+        self.report_lookups("combined index", words, lambda word: word in index.dawg)
+        self.report_lookups("combined index (mmap reader)", words, lambda word: index.get_node_mask(
+            index.reader.follow_bytes(index.reader.ROOT, word.encode()) or 0
+        ) != 0)
+        self.report_lookups("GADDAG (mmap reader)", words, gaddag.contains)
+
+        # Finding words through a letter in the middle needs a scan of the DAWG, but one walk of the GADDAG
+        infixes = ["".join(rng.choices(string.ascii_lowercase, k=2)) for _ in range(20)]
+        all_words = index.dawg.keys()
+        self.stdout.write(f"Infix lookups ({len(infixes)} two letter infixes):")
+        self.report_lookups("combined index (scan)", infixes, lambda infix: any(infix in word for word in all_words))
+        self.report_lookups("GADDAG (mmap reader)", infixes, gaddag.infix_node)
+
+        # The board depends only on the seed and turns, as it has its own random generator
+        board = self.play_turns(options["turns"], random.Random(options["seed"]))
+        self.stdout.write(f"Move generation (rack {options['rack']} after {options['turns']} turns):")
+        for limit in (10, None):
+            generator = ScrabbleMoveGenerator(board, [Dictionary.ospd4])
+            moves, elapsed = self.timed(generator.generate, list(options["rack"]), limit)
+            self.stdout.write(f"  {f'limit {limit}':<32}{len(moves):>12} moves{elapsed * 1000:>10.1f}ms")
+
+    def timed(self, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+    def play_turns(self, turns, rng):
+        """Returns the board after turns of the highest scoring play, with racks drawn from a shuffled bag"""
+        bag = [tile for tile, count in SCRABBLE_TILE_FREQUENCIES.items() for _ in range(count)]
+        rng.shuffle(bag)
+        board_size = ScrabbleEngine.board_size
+        board = [["" for _ in range(board_size)] for _ in range(board_size)]
+        rack = []
+        for _ in range(turns):
+            while len(rack) < ScrabbleEngine.rack_size and bag:
+                rack.append(bag.pop())
+            moves = ScrabbleMoveGenerator(board, [Dictionary.ospd4]).generate(rack, limit=1)
+            if not moves:
+                break
+            GameBoard(board).update_board(moves[0]["tiles"])
+            for played_tile in moves[0]["tiles"]:
+                rack.remove(played_tile["tile"][0])
+        return board
+
+    def mutate(self, word, rng):
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+    def report(self, name, size_bytes, load_time):
+        self.stdout.write(f"  {name:<32}{size_bytes:>12} bytes{load_time * 1000:>10.1f}ms")
+
+    def report_lookups(self, name, keys, lookup):
+        _, elapsed = self.timed(lambda: [lookup(key) for key in keys])
+        self.stdout.write(f"  {name:<32}{elapsed / len(keys) * 1e6:>10.2f}us per lookup")
@@ -1,27 +1,158 @@
-import os.path
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import dawg
-from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from scrabble.constants import Dictionary
+from scrabble.dictionaries import (
+    COMBINED_INDEX_NAME, CombinedIndex, file_checksum, get_dictionary_path, load_dawg, read_manifest, write_manifest
+)
+from scrabble.engine.constants import TILE_SCORES
+from scrabble.gaddag import GADDAG_NAME, build_gaddag
+
+VALID_LETTERS = frozenset(letter.lower() for letter in TILE_SCORES if letter.isalpha())
+
+
+def read_words(file_path):
+    """
+    Yields normalized words from a wordlist, one line at a time.
+    Assumes valid words are line separated, strips extra words on each line and skips blank and comment lines.
+    """
+    with open(file_path, 'r') as f:
+        for line in f:
+            word = line.split(" ")[0].strip().lower()
+            if word and not word.startswith("#"):
+                yield word
+
+
+def build_dictionary(file_path, dictionary_name):
+    """
+    Builds and writes a DAWG for one wordlist, returning its build stats. Runs in a worker process.
+    The wordlist's words are held in memory, as the DAWG is built from them deduplicated and sorted.
+    """
+    start = time.perf_counter()
+    words = set()
+    line_count = 0
+    rejected = []
+    for word in read_words(file_path):
+        line_count += 1
+        if not VALID_LETTERS.issuperset(word):
+            rejected.append(word)
+            continue
+        words.add(word)
+    d = dawg.CompletionDAWG(sorted(words))
+    output_path = get_dictionary_path(dictionary_name)
+    # Write next to the destination and swap it in, so running processes never read a partial file
+    tmp_path = f"{output_path}.tmp"
+    d.save(tmp_path)
+    os.replace(tmp_path, output_path)
+    return {
+        "name": dictionary_name,
+        "word_count": len(words),
+        "duplicate_count": line_count - len(rejected) - len(words),
+        "rejected": rejected,
+        "build_time": time.perf_counter() - start,
+    }
 
 
 class Command(BaseCommand):
+    help = "Builds dictionary DAWGs from wordlists, then rebuilds the combined index, GADDAG and manifest"
+
     def add_arguments(self, parser):
-        parser.add_argument('--input', required=True)
-        parser.add_argument('--name', required=True)
+        parser.add_argument('--input', action='append', default=[], help="Wordlist file, may be repeated")
+        parser.add_argument('--name', action='append', default=[], help="Dictionary name for each --input")
+        parser.add_argument('--workers', type=int, default=None, help="Number of build processes")
+        parser.add_argument(
+            '--combine', action='store_true',
+            help="Only rebuild the combined index and GADDAG from the existing dictionaries"
+        )
 
     def handle(self, *args, **options):
-        """
-        Creates a DAWG file from a wordlist with the given name.
-        Assumes valid words are line separated, strips extra words on each line.
-        """
-        file_path = options["input"]
-        dictionary_name = options["name"]
-        with open(file_path, 'r') as f:
-            words = [
-                line.split(" ")[0].strip().lower()
-                for line in f.readlines()
-            ]
-        d = dawg.CompletionDAWG(words)
-        dawg_file_name = os.path.join(settings.BASE_DIR, f"dictionaries/{dictionary_name}.dawg")
-        d.save(dawg_file_name)
+        if not options["combine"]:
+            if not options["input"] or len(options["input"]) != len(options["name"]):
+                raise CommandError("Each --input requires a matching --name unless using --combine")
+            unknown_names = [name for name in options["name"] if name not in Dictionary.values]
+            if unknown_names:
+                # The combined index and GADDAG are only built from known dictionaries
+                raise CommandError(
+                    f"Unknown dictionary {', '.join(unknown_names)}, expected one of {', '.join(Dictionary.values)}"
+                )
+            self.build_dictionaries(list(zip(options["input"], options["name"])), options["workers"])
+        words = self.build_combined_index()
+        self.build_gaddag(words)
+
+    def build_dictionaries(self, wordlists, workers):
+        manifest = read_manifest()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(build_dictionary, *zip(*wordlists)))
+        for result in results:
+            name = result["name"]
+            self.update_manifest_entry(manifest, name, word_count=result["word_count"])
+            if result["rejected"]:
+                examples = ", ".join(result["rejected"][:5])
+                self.stderr.write(
+                    f"{name}: rejected {len(result['rejected'])} words with invalid letters ({examples})"
+                )
+            self.stdout.write(
+                f"{name} v{manifest[name]['version']}: {result['word_count']} words "
+                f"({result['duplicate_count']} duplicates removed) in {result['build_time']:.2f}s, "
+                f"{manifest[name]['size_bytes']} bytes"
+            )
+        write_manifest(manifest)
+
+    def build_combined_index(self):
+        manifest = read_manifest()
+        dictionary_names = [name for name in Dictionary.values if os.path.exists(get_dictionary_path(name))]
+        start = time.perf_counter()
+        index = CombinedIndex.build(dictionary_names)
+        output_path = get_dictionary_path(COMBINED_INDEX_NAME)
+        index.dawg.save(f"{output_path}.tmp")
+        os.replace(f"{output_path}.tmp", output_path)
+        build_time = time.perf_counter() - start
+        for name in dictionary_names:
+            # Record dictionaries built before the manifest existed
+            if name not in manifest:
+                self.update_manifest_entry(manifest, name, word_count=sum(1 for _ in load_dawg(name).iterkeys()))
+        self.update_manifest_entry(
+            manifest, COMBINED_INDEX_NAME, word_count=len(index.dawg.keys()), sources=dictionary_names
+        )
+        write_manifest(manifest)
+        self.stdout.write(
+            f"{COMBINED_INDEX_NAME} v{manifest[COMBINED_INDEX_NAME]['version']}: "
+            f"{manifest[COMBINED_INDEX_NAME]['word_count']} words from {', '.join(dictionary_names)} "
+            f"in {build_time:.2f}s, {manifest[COMBINED_INDEX_NAME]['size_bytes']} bytes"
+        )
+        return index.dawg.keys()
+
+    def build_gaddag(self, words):
+        """Builds the GADDAG from the words of all dictionaries, as merged into the combined index"""
+        manifest = read_manifest()
+        start = time.perf_counter()
+        gaddag = build_gaddag(words)
+        output_path = get_dictionary_path(GADDAG_NAME)
+        gaddag.save(f"{output_path}.tmp")
+        os.replace(f"{output_path}.tmp", output_path)
+        build_time = time.perf_counter() - start
+        self.update_manifest_entry(
+            manifest, GADDAG_NAME, word_count=len(words), sources=manifest[COMBINED_INDEX_NAME]["sources"]
+        )
+        write_manifest(manifest)
+        self.stdout.write(
+            f"{GADDAG_NAME} v{manifest[GADDAG_NAME]['version']}: {len(words)} words "
+            f"in {build_time:.2f}s, {manifest[GADDAG_NAME]['size_bytes']} bytes"
+        )
+
+    def update_manifest_entry(self, manifest, name, **extra):
+        file_path = get_dictionary_path(name)
+        previous = manifest.get(name, {})
+        manifest[name] = {
+            "file": os.path.basename(file_path),
+            "version": previous.get("version", 0) + 1,
+            "sha256": file_checksum(file_path),
+            "size_bytes": os.path.getsize(file_path),
+            "built_on": timezone.now().isoformat(timespec="seconds"),
+            **extra,
+        }
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from common.models import User
+from scrabble.gameplay.statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Recalculates users' statistics from their turns and finished games"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', help="Emails of the users to rebuild, all users if not given")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options["users"]:
+            users = users.filter(email__in=options["users"])
+        user_ids = list(users.values_list("id", flat=True))
+        with transaction.atomic():
+            rebuild_statistics(user_ids)
+        self.stdout.write(f"Rebuilt statistics of {len(user_ids)} users")
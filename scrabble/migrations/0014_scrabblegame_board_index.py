@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0013_gameplayer_archived_scrabblegame_archived_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='board_index',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
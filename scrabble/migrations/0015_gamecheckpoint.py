@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0014_scrabblegame_board_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('turn_count', models.IntegerField()),
+                ('state', models.JSONField()),
+                ('game', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='scrabble.scrabblegame'
+                )),
+            ],
+            options={
+                'unique_together': {('game', 'turn_count')},
+            },
+        ),
+    ]
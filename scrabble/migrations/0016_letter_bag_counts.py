@@ -0,0 +1,61 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+# BAG_TILES when the letter bag was converted
+BAG_TILES = [*"ABCDEFGHIJKLMNOPQRSTUVWXYZ", "-", "*"]
+
+
+def letter_bag_to_counts(apps, schema_editor):
+    ScrabbleGame = apps.get_model("scrabble", "ScrabbleGame")
+    for game in ScrabbleGame.objects.only("letter_bag").iterator():
+        game.bag_counts = [game.letter_bag.count(tile) for tile in BAG_TILES]
+        game.save(update_fields=["bag_counts"])
+
+
+def counts_to_letter_bag(apps, schema_editor):
+    ScrabbleGame = apps.get_model("scrabble", "ScrabbleGame")
+    for game in ScrabbleGame.objects.only("bag_counts").iterator():
+        game.letter_bag = [tile for tile, count in zip(BAG_TILES, game.bag_counts) for _ in range(count)]
+        game.save(update_fields=["letter_bag"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0015_gamecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='bag_counts',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), null=True, size=28),
+        ),
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='bag_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='tiles_drawn',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='scrabblegame',
+            name='letter_bag',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=1), null=True, size=None
+            ),
+        ),
+        migrations.RunPython(letter_bag_to_counts, counts_to_letter_bag),
+        migrations.RemoveField(
+            model_name='scrabblegame',
+            name='letter_bag',
+        ),
+        migrations.AlterField(
+            model_name='scrabblegame',
+            name='bag_counts',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=28),
+        ),
+    ]
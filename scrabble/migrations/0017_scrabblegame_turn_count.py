@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_turn_counts(apps, schema_editor):
+    ScrabbleGame = apps.get_model("scrabble", "ScrabbleGame")
+    games = ScrabbleGame.objects.annotate(max_turn_count=Max("racks__turns__turn_count")).filter(
+        max_turn_count__isnull=False
+    )
+    for game in games.iterator():
+        game.turn_count = game.max_turn_count
+        game.save(update_fields=["turn_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0016_letter_bag_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='turn_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_turn_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0017_scrabblegame_turn_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameturn',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gameturn',
+            unique_together={('game_player', 'idempotency_key')},
+        ),
+    ]
@@ -0,0 +1,32 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Max, Q
+from django.db.models.functions import Coalesce
+
+
+def set_last_activity(apps, schema_editor):
+    ScrabbleGame = apps.get_model("scrabble", "ScrabbleGame")
+    games = ScrabbleGame.objects.annotate(
+        last_activity=Coalesce(
+            Max("racks__turns__created_on", filter=Q(racks__turns__deleted=False)), F("created_on")
+        )
+    )
+    for game in games.only("id", "created_on").iterator():
+        game.last_activity_at = game.last_activity
+        game.save(update_fields=["last_activity_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0018_gameturn_idempotency_key_scrabblegame_version_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrabblegame',
+            name='last_activity_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(set_last_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('scrabble', '0019_scrabblegame_last_activity_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatistics',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('play_count', models.IntegerField(default=0)),
+                ('play_score_sum', models.IntegerField(default=0)),
+                ('play_score_max', models.IntegerField(null=True)),
+                ('longest_word', models.CharField(blank=True, default='', max_length=15)),
+                ('games_played', models.IntegerField(default=0)),
+                ('games_won', models.IntegerField(default=0)),
+                ('game_score_sum', models.IntegerField(default=0)),
+                ('game_score_max', models.IntegerField(null=True)),
+                ('user', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to=settings.AUTH_USER_MODEL
+                )),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_turn_versions(apps, schema_editor):
+    # Earlier versions aren't known, so existing turns count as changed by the game's current version
+    GamePlayer = apps.get_model("scrabble", "GamePlayer")
+    GameTurn = apps.get_model("scrabble", "GameTurn")
+    GameTurn.objects.update(
+        version=Subquery(GamePlayer.objects.filter(id=OuterRef("game_player_id")).values("game__version")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrabble', '0020_userstatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameturn',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_turn_versions, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,49 @@
+import random
 from collections import defaultdict
-from random import randint
 
+from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
-from django.db.models import Sum
+from django.db.models import F, FilteredRelation, Max, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from common.models import TimestampedModel, User
 from scrabble.constants import TurnAction, WordGame, Dictionary
+from scrabble.dictionaries import LRUCache
+from scrabble.engine.bag import BAG_TILES, LetterBag
+
+scorecard_cache = LRUCache(settings.SCORECARD_CACHE_SIZE)
+# Player names are shown on the scorecard, so as many games are cached
+player_display_cache = LRUCache(settings.SCORECARD_CACHE_SIZE)
+
+
+def get_unique_prefix(name, other_names):
+    """Returns the shortest prefix of name which none of other_names start with, or the whole name"""
+    for i in range(len(name)):
+        if not any(other_name.startswith(name[:i + 1]) for other_name in other_names):
+            return name[:i + 1]
+    return name
 
 
 # Create your models here.
 class ScrabbleGame(TimestampedModel):
-    letter_bag = ArrayField(models.CharField(max_length=1))
+    # Count of each tile of BAG_TILES left in the letter bag
+    bag_counts = ArrayField(models.IntegerField(), size=len(BAG_TILES))
+    # Draws are reproducible for games with a seed
+    bag_seed = models.BigIntegerField(null=True, blank=True)
+    tiles_drawn = models.IntegerField(default=0)
     board = ArrayField(
         ArrayField(models.CharField(max_length=5, default=""), size=15),
         size=15
     )
     next_turn_index = models.IntegerField(default=0)
+    # Highest turn_count of the game's turns, including deleted turns
+    turn_count = models.IntegerField(default=0)
+    # Incremented by each write of a turn, which only succeeds if the version is unchanged since the game was loaded
+    version = models.IntegerField(default=0)
+    # Set when the game is created and whenever a turn is written or undone, to list games by recent activity
+    last_activity_at = models.DateTimeField(default=timezone.now, db_index=True)
     over = models.BooleanField(default=False)
     archived_on = models.DateTimeField(null=True)
     game_type = models.CharField(choices=WordGame.choices, max_length=32)
@@ -24,15 +51,20 @@ class ScrabbleGame(TimestampedModel):
     prevent_stack_duplicates = models.BooleanField(default=False, blank=True)
     validate_words = models.BooleanField(default=False, blank=True)
     selected_dictionaries = ArrayField(models.CharField(choices=Dictionary.choices, max_length=32), null=True)
+    # Cross-checks and connected squares of the board, see BoardIndex
+    board_index = models.JSONField(null=True, blank=True)
+
+    @property
+    def letter_bag(self):
+        """LetterBag of the tiles left, changing bag_counts in place"""
+        return LetterBag(self.bag_counts)
 
     def draw_tiles(self, num_tiles, commit=False):
-        """Returns num_tiles tiles & new letter bag. If commit=True, also saves letter bag."""
-        tiles = []
-        for _ in range(num_tiles):
-            if len(self.letter_bag) == 0:
-                break
-            tile = self.letter_bag.pop(randint(0, len(self.letter_bag) - 1))
-            tiles.append(tile)
+        """Returns up to num_tiles tiles drawn from the letter bag. If commit=True, also saves letter bag."""
+        # A seeded game's draws depend only on the seed and the number of tiles drawn before
+        rng = random if self.bag_seed is None else random.Random(f"{self.bag_seed}:{self.tiles_drawn}")
+        tiles = self.letter_bag.draw(num_tiles, rng)
+        self.tiles_drawn += len(tiles)
         if commit:
             self.save()
         return tiles
@@ -47,14 +79,6 @@ class ScrabbleGame(TimestampedModel):
             return None
         return self.all_turns().reverse()[0]
 
-    def update_turn_index(self, backwards=False):
-        update = -1 if backwards else 1
-        self.next_turn_index = (self.next_turn_index + update) % self.racks.count()
-        if not self.racks.exclude(rack=[]).exists():
-            return
-        if len(self.next_player().rack) == 0:
-            self.update_turn_index(backwards=backwards)
-
     def next_player(self):
         return self.racks.get(turn_index=self.next_turn_index)
 
@@ -80,29 +104,38 @@ class ScrabbleGame(TimestampedModel):
         return self.racks.aggregate(Sum("score"))["score__sum"]
 
     def get_scorecard_rows(self):
-        player_count = self.racks.count()
-        player_turns = defaultdict(list)
-        if not self.all_turns().exists():
-            return []
+        """Each player's (turn score, running total) for each round, cached per game version"""
+        return scorecard_cache.get_or_set((self.id, self.version), self._get_scorecard_rows)
+
+    def _get_scorecard_rows(self):
+        # One row per turn of each player, or a row without a turn for a player who hasn't played
+        order_by = F("turn__turn_count").asc()
+        rows = self.racks.annotate(
+            turn=FilteredRelation("turns", condition=Q(turns__deleted=False)),
+            round_number=Window(RowNumber(), partition_by=F("id"), order_by=order_by),
+            running_total=Window(Sum("turn__score"), partition_by=F("id"), order_by=order_by),
+        ).values_list("turn_index", "round_number", "turn__score", "running_total")
+        player_count = 0
+        rounds = defaultdict(dict)
+        for turn_index, round_number, score, running_total in rows:
+            player_count = max(player_count, turn_index + 1)
+            if score is not None:
+                rounds[round_number][turn_index] = (score, running_total if score else "--")
         # It's possible for one player to have fewer turns at the end of the game (forfeit, upwords go out)
-        for turn in self.all_turns():
-            player_turns[turn.game_player.turn_index].append(turn)
-        num_rounds = max(len(turns) for turns in player_turns.values())
-
-        cumulative_scores = defaultdict(int)
-        scorecard_rows = []
-        round_list = []
-        for round_index in range(num_rounds):
-            for turn_index in range(player_count):
-                if len(player_turns[turn_index]) < round_index + 1:
-                    round_list.append((0, ""))
-                else:
-                    turn = player_turns[turn_index][round_index]
-                    cumulative_scores[turn.game_player_id] += turn.score
-                    round_list.append((turn.score, cumulative_scores[turn.game_player_id] if turn.score else "--"))
-            scorecard_rows.append(round_list)
-            round_list = []
-        return scorecard_rows
+        return [[rounds[number].get(i, (0, "")) for i in range(player_count)] for number in sorted(rounds)]
+
+    def get_player_display(self):
+        """Each player's short name and shortest unique initial, by turn index, cached until a player's user changes"""
+        users_updated_on = User.objects.filter(game_racks__game=self).aggregate(Max("updated_on"))["updated_on__max"]
+        return player_display_cache.get_or_set((self.id, users_updated_on), self._get_player_display)
+
+    def _get_player_display(self):
+        names = [rack.user.get_short_name() for rack in self.ordered_racks()]
+        lower_names = [name.lower() for name in names]
+        return [
+            {"name": name, "initial": get_unique_prefix(lower_names[i], lower_names[:i] + lower_names[i + 1:])}
+            for i, name in enumerate(names)
+        ]
 
     def get_dictionaries(self):
         ospds = [Dictionary.ospd2, Dictionary.ospd3, Dictionary.ospd4]
@@ -130,13 +163,7 @@ class GamePlayer(TimestampedModel):
         unique_together = [('game', 'turn_index'), ('game', 'user')]
 
     def get_player_initial(self):
-        other_names = [rack.user.get_short_name().lower() for rack in self.game.racks.exclude(id=self.id)]
-        player_name = self.user.get_short_name().lower()
-        for i in range(len(player_name)):
-            matches = [name for name in other_names if name[0:i+1] == player_name[0:i+1]]
-            if not matches:
-                return player_name[0:i+1]
-        return player_name
+        return self.game.get_player_display()[self.turn_index]["initial"]
 
 
 class GameTurn(TimestampedModel):
@@ -148,3 +175,34 @@ class GameTurn(TimestampedModel):
     rack_before_turn = ArrayField(models.CharField(max_length=1), size=7)
     turn_data = models.JSONField(null=True)
     deleted = models.BooleanField(default=False)
+    # Version of the game written with the turn, or with its undo once deleted
+    version = models.IntegerField(default=0)
+    # Sent by the client with the turn, so a retried submission isn't played twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        unique_together = [('game_player', 'idempotency_key')]
+
+
+class GameCheckpoint(TimestampedModel):
+    """Board and scores of a game after its turns up to turn_count, saved so replays don't start from the beginning"""
+    game = models.ForeignKey(ScrabbleGame, related_name="checkpoints", on_delete=models.CASCADE)
+    turn_count = models.IntegerField()
+    # ReplayState.to_json()
+    state = models.JSONField()
+
+    class Meta:
+        unique_together = [('game', 'turn_count')]
+
+
+class UserStatistics(TimestampedModel):
+    """Totals of a user's plays and finished games, kept up to date by turns so the dashboard reads one row"""
+    user = models.OneToOneField(User, related_name="statistics", on_delete=models.CASCADE)
+    play_count = models.IntegerField(default=0)
+    play_score_sum = models.IntegerField(default=0)
+    play_score_max = models.IntegerField(null=True)
+    longest_word = models.CharField(max_length=15, default="", blank=True)
+    games_played = models.IntegerField(default=0)
+    games_won = models.IntegerField(default=0)
+    game_score_sum = models.IntegerField(default=0)
+    game_score_max = models.IntegerField(null=True)
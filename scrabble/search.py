@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import string
+
+from scrabble.constants import BLANK_CHARS
+from scrabble.dictionaries import registry
+from scrabble.engine.constants import TILE_SCORES
+
+# Rack and pattern character matching any letter
+WILDCARD = "?"
+LETTER_LABELS = {ord(letter): letter for letter in string.ascii_lowercase}
+LETTER_SCORES = {letter: TILE_SCORES[letter.upper()] for letter in string.ascii_lowercase}
+# Most results a search request can ask for
+MAX_LIMIT = 500
+
+
+class SearchUnavailableError(Exception):
+    """Raised when the dictionary index needed for search isn't available"""
+
+
+def search_words(rack, dictionary_names, pattern=None, min_length=2, max_length=None, limit=None):
+    """
+    Finds words which can be made from the rack letters, ranked by base score.
+    Blank chars (or "?") in the rack match any letter and score nothing.
+    If a pattern such as "?A?E" is given, its letters are fixed (already on the board) and each "?" is filled
+    from the rack, so only words of the pattern's length are returned.
+    Returns a list of {"word", "score", "blanks"} dicts, where blanks lists the word positions filled by blanks.
+    With a limit, branches which can't score enough to make the results aren't walked.
+    """
+    index = registry.get_index()
+    if index is None or not index.covers(dictionary_names):
+        raise SearchUnavailableError("Word search requires the combined dictionary index")
+    mask = index.get_mask(dictionary_names)
+    reader = index.reader
+    # Remaining rack tiles, with blanks counted under WILDCARD
+    counts = {letter: 0 for letter in string.ascii_lowercase + WILDCARD}
+    for tile in rack.lower():
+        if tile in BLANK_CHARS:
+            counts[WILDCARD] += 1
+        elif tile in counts:
+            counts[tile] += 1
+        else:
+            raise ValueError(f"Invalid rack tile {tile}")
+    if pattern:
+        pattern = pattern.lower()
+        if any(char not in counts for char in pattern):
+            raise ValueError(f"Invalid pattern {pattern}")
+        min_length = max_length = len(pattern)
+    elif max_length is None or max_length > len(rack):
+        max_length = len(rack)
+    # Score of the pattern's letters from each position on
+    pattern_scores = [0] * (max_length + 1)
+    for i in range(max_length - 1, -1, -1):
+        letter = pattern[i] if pattern else WILDCARD
+        pattern_scores[i] = pattern_scores[i + 1] + LETTER_SCORES.get(letter, 0)
+    # Score of the rack tiles not yet used
+    rack_score = sum(LETTER_SCORES[letter] * counts[letter] for letter in string.ascii_lowercase)
+    # With a limit, the lowest ranked results are first. Words are walked in alphabetical order, so a word found
+    # later ranks below the results of the same score.
+    results = []
+    sequence = itertools.count()
+    word = []
+    blank_positions = []
+
+    # The rack's letters, in the alphabetical order of the walk
+    rack_letters = sorted(letter for letter in string.ascii_lowercase if counts[letter])
+    follow = reader.follow
+    get_node_mask = index.get_node_mask
+
+    def _search(node, score):
+        nonlocal rack_score
+        depth = len(word)
+        if limit and len(results) == limit and score + rack_score + pattern_scores[depth] <= results[0][0]:
+            return
+        # A word ends at node, and comes before the words continuing from it
+        if depth >= min_length and get_node_mask(node) & mask:
+            result = {"word": "".join(word).upper(), "score": score, "blanks": list(blank_positions)}
+            if not limit:
+                results.append(result)
+            elif len(results) < limit:
+                heapq.heappush(results, (score, -next(sequence), result))
+            elif score > results[0][0]:
+                heapq.heapreplace(results, (score, -next(sequence), result))
+        if depth == max_length:
+            return
+        fixed = pattern[depth] if pattern and pattern[depth] != WILDCARD else None
+        if fixed:
+            children = [(fixed, follow(node, ord(fixed)))]
+        elif counts[WILDCARD]:
+            children = ((LETTER_LABELS.get(label), child) for label, child in reader.children(node))
+        else:
+            # Without blanks, only the letters left in the rack can follow
+            children = [(letter, follow(node, ord(letter))) for letter in rack_letters if counts[letter]]
+        for letter, child in children:
+            if letter is None or child is None:
+                continue
+            word.append(letter)
+            if fixed:
+                _search(child, score + LETTER_SCORES[letter])
+            # Prefer real tiles to blanks, which only changes which positions score when letters repeat
+            elif counts[letter]:
+                counts[letter] -= 1
+                rack_score -= LETTER_SCORES[letter]
+                _search(child, score + LETTER_SCORES[letter])
+                rack_score += LETTER_SCORES[letter]
+                counts[letter] += 1
+            else:
+                counts[WILDCARD] -= 1
+                blank_positions.append(depth)
+                _search(child, score)
+                blank_positions.pop()
+                counts[WILDCARD] += 1
+            word.pop()
+
+    _search(reader.ROOT, 0)
+    if limit:
+        results = [result for _, _, result in results]
+    results.sort(key=lambda result: (-result["score"], result["word"]))
+    return results
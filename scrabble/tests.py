@@ -1,3 +1,859 @@
-from django.test import TestCase
+import asyncio
+import copy
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from common.constants import NotificationType
+from common.models import User
+from common.notifications import create_notification
+from scrabble.constants import Dictionary, TurnAction, WordGame
+from scrabble.dictionaries import (
+    COMBINED_INDEX_NAME, DictionaryRegistry, LRUCache, get_dictionary_path, get_replaces, load_dawg, read_manifest,
+    registry, solve_blanks, validate_word, word_cache
+)
+from scrabble.engine.bag import LetterBag
+from scrabble.engine.board import GameBoard
+from scrabble.engine.constants import SCRABBLE, UPWORDS
+from scrabble.engine.rules import PlayError, get_engine
+from scrabble.engine.replay import get_letter_bag
+from scrabble.gaddag import GADDAG_NAME, Gaddag, build_gaddag, gaddag_keys
+from scrabble.gameplay.board_index import HORIZONTAL, LETTER_BITS, BoardIndex
+from scrabble.gameplay.replay import GameReplayer
+from scrabble.gameplay.scrabble_move_generator import ScrabbleMoveGenerator
+from scrabble.gameplay.statistics import rebuild_statistics
+from scrabble.gameplay.upwords_move_generator import UpwordsMoveGenerator
+from scrabble.helpers import archive_game, get_calculator
+from scrabble.models import GamePlayer, GameTurn, ScrabbleGame, UserStatistics, get_unique_prefix
+from scrabble.search import search_words
+
+CAT = [{"tile": "C", "x": 6, "y": 7}, {"tile": "A", "x": 7, "y": 7}, {"tile": "T", "x": 8, "y": 7}]
+
+
+class DictionaryRegistryTest(TestCase):
+    def test_loads_on_first_use(self):
+        dictionaries = DictionaryRegistry()
+        self.assertFalse(dictionaries.is_loaded(Dictionary.ospd4))
+        self.assertEqual(dictionaries.stats(), {})
+        d = dictionaries.get(Dictionary.ospd4)
+        self.assertIn("qi", d)
+        self.assertIs(dictionaries.get(Dictionary.ospd4), d)
+        self.assertTrue(dictionaries.is_loaded(Dictionary.ospd4))
+        self.assertFalse(dictionaries.is_loaded(Dictionary.ospd2))
+        self.assertEqual(list(dictionaries.stats()), [Dictionary.ospd4])
+        self.assertEqual(
+            dictionaries.stats()[Dictionary.ospd4]["file_size_bytes"],
+            os.path.getsize(get_dictionary_path(Dictionary.ospd4)),
+        )
+
+    def test_unsupported_dictionary(self):
+        with self.assertRaises(Exception):
+            DictionaryRegistry().get("klingon")
+
+
+class CombinedIndexTest(TestCase):
+    def setUp(self):
+        self.index = registry.get_index()
+
+    def test_dictionaries(self):
+        self.assertTrue(self.index.covers(Dictionary.values))
+        self.assertFalse(self.index.covers(["klingon"]))
+        self.assertEqual(self.index.get_dictionaries("QI"), [Dictionary.ospd4, Dictionary.csw])
+        self.assertEqual(self.index.get_dictionaries("grrl"), [Dictionary.csw])
+        self.assertEqual(self.index.get_dictionaries("zzzz"), [])
+
+    def test_matches_dictionaries(self):
+        replaces = get_replaces(("-",))
+        for dictionary_names in [[Dictionary.ospd2], [Dictionary.ospd4, Dictionary.csw]]:
+            for word in ["q-", "gr-l", "-at"]:
+                matches = set()
+                for dictionary_name in dictionary_names:
+                    matches.update(registry.get(dictionary_name).similar_keys(word, replaces))
+                self.assertEqual(set(self.index.similar_keys(word, replaces, dictionary_names)), matches)
+
+
+class SolveBlanksTest(TestCase):
+    def setUp(self):
+        word_cache.clear()
+
+    def test_one_letter_for_all_words(self):
+        # C-T alone would be CAT, COT or CUT, and -X alone AX, EX or OX
+        self.assertEqual(solve_blanks(["C-T", "-X"], [Dictionary.ospd4]), ([], {"-": "a"}))
+        self.assertEqual(solve_blanks(["-X", "C-T"], [Dictionary.ospd4]), ([], {"-": "a"}))
+        self.assertEqual(solve_blanks(["C-T", "-X", "-F"], [Dictionary.ospd4]), ([], {"-": "o"}))
+
+    def test_invalid_words(self):
+        self.assertEqual(solve_blanks(["CAT", "QQQ"], [Dictionary.ospd4]), (["QQQ"], {}))
+        self.assertEqual(solve_blanks(["C-T", "-Q"], [Dictionary.ospd4]), (["-Q"], {"-": "a"}))
+        self.assertEqual(solve_blanks(["-QQ"], [Dictionary.ospd4]), (["-QQ"], {"-": None}))
+
+    def test_two_blanks(self):
+        self.assertEqual(solve_blanks(["-*"], [Dictionary.ospd4]), ([], {"-": "a", "*": "a"}))
+        self.assertEqual(solve_blanks(["Q-", "*X"], [Dictionary.ospd4]), ([], {"-": "i", "*": "a"}))
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        self.assertEqual(cache.get_or_set("a", lambda: 1), 1)
+        cache.get_or_set("b", lambda: 2)
+        self.assertEqual(cache.get_or_set("a", lambda: 3), 1)
+        cache.get_or_set("c", lambda: 4)
+        self.assertEqual(cache.get_or_set("b", lambda: 5), 5)
+        self.assertEqual(cache.get_or_set("c", lambda: 6), 4)
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"], stats["evictions"]), (2, 2, 4, 2))
+        self.assertEqual(stats["hit_rate"], 0.3333)
+        cache.clear()
+        self.assertEqual((cache.stats()["size"], cache.stats()["hit_rate"]), (0, None))
+
+    def test_word_lookups(self):
+        word_cache.clear()
+        self.assertTrue(validate_word("C-T", [Dictionary.ospd4]))
+        self.assertTrue(validate_word("c-t", [Dictionary.ospd4]))
+        self.assertFalse(validate_word("C-T", [Dictionary.long]))
+        self.assertEqual((word_cache.hits, word_cache.misses), (1, 2))
+
+    def test_stats_view(self):
+        url = reverse("scrabble:dictionary_stats")
+        user = User.objects.create_user("staff@example.com")
+        self.client.force_login(user)
+        with self.assertLogs("django.request", "WARNING"):
+            self.assertEqual(self.client.get(url).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertIn("word_cache", self.client.get(url).json())
+
+
+class ImportDawgTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        os.mkdir(os.path.join(tmp_dir.name, "dictionaries"))
+        self.wordlist = os.path.join(tmp_dir.name, "words.txt")
+        with open(self.wordlist, "w") as f:
+            f.write("# Comment\nCAT\ncat definition\n\nDOG\nca-t\n")
+        settings_override = self.settings(BASE_DIR=tmp_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_import(self):
+        stderr = io.StringIO()
+        call_command(
+            "import_dawg", input=[self.wordlist], name=[Dictionary.ospd4], workers=1, stdout=io.StringIO(),
+            stderr=stderr
+        )
+        self.assertEqual(load_dawg(Dictionary.ospd4).keys(), ["cat", "dog"])
+        self.assertIn("rejected 1 words with invalid letters (ca-t)", stderr.getvalue())
+        manifest = read_manifest()
+        self.assertEqual((manifest[Dictionary.ospd4]["version"], manifest[Dictionary.ospd4]["word_count"]), (1, 2))
+        self.assertEqual(manifest[COMBINED_INDEX_NAME]["sources"], [Dictionary.ospd4])
+        self.assertTrue(Gaddag(get_dictionary_path(GADDAG_NAME)).contains("dog"))
+
+        call_command("import_dawg", combine=True, stdout=io.StringIO())
+        self.assertEqual(read_manifest()[COMBINED_INDEX_NAME]["version"], 2)
+
+    def test_unknown_name(self):
+        with self.assertRaises(CommandError):
+            call_command("import_dawg", input=[self.wordlist], name=["klingon"])
+
+
+class SearchWordsTest(TestCase):
+    def test_anagrams(self):
+        self.assertEqual(search_words("TAC", [Dictionary.ospd4]), [
+            {"word": "ACT", "score": 5, "blanks": []},
+            {"word": "CAT", "score": 5, "blanks": []},
+            {"word": "AT", "score": 2, "blanks": []},
+            {"word": "TA", "score": 2, "blanks": []},
+        ])
+        self.assertEqual(search_words("TAC", [Dictionary.ospd4], min_length=3, limit=1), [
+            {"word": "ACT", "score": 5, "blanks": []}
+        ])
+
+    def test_blanks(self):
+        results = search_words("C-T", [Dictionary.ospd4], min_length=3)
+        self.assertIn({"word": "CAT", "score": 4, "blanks": [1]}, results)
+        self.assertEqual(search_words("C?T", [Dictionary.ospd4], min_length=3), results)
+
+    def test_limit(self):
+        results = search_words("AE-*RST", [Dictionary.ospd4])
+        for limit in (1, 10, 100):
+            self.assertEqual(search_words("AE-*RST", [Dictionary.ospd4], limit=limit), results[:limit])
+
+    def test_pattern(self):
+        self.assertEqual(
+            [result["word"] for result in search_words("CTS", [Dictionary.ospd4], pattern="?A?")],
+            ["CAT", "SAC", "SAT", "TAS"],
+        )
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            search_words("C1T", [Dictionary.ospd4])
+        with self.assertRaises(ValueError):
+            search_words("CAT", [Dictionary.ospd4], pattern="?A!")
+
+
+class GaddagTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        file_path = os.path.join(tmp_dir.name, "gaddag.dawg")
+        build_gaddag(["cat", "cats", "scat", "at"]).save(file_path)
+        self.gaddag = Gaddag(file_path)
+
+    def test_keys(self):
+        self.assertEqual(list(gaddag_keys(["cat"])), ["c+at", "ac+t", "tac+"])
+
+    def test_contains(self):
+        for word in ["cat", "CATS", "scat", "at"]:
+            self.assertTrue(self.gaddag.contains(word), word)
+        for word in ["ca", "a", "cast", ""]:
+            self.assertFalse(self.gaddag.contains(word), word)
+        self.assertTrue(registry.get_gaddag().contains("qi"))
+
+    def test_infix(self):
+        self.assertIsNotNone(self.gaddag.infix_node("ca"))
+        self.assertIsNone(self.gaddag.infix_node("tc"))
+        # "cats" continues from the node of "at" leftwards with "c", then rightwards after the separator with "s"
+        node = self.gaddag.follow(self.gaddag.infix_node("at"), ord("c"))
+        self.assertTrue(self.gaddag.is_terminal(self.gaddag.follow_bytes(node, b"+s")))
+
+
+class GameTestCase(TestCase):
+    def setUp(self):
+        self.game = ScrabbleGame(game_type=WordGame.scrabble, bag_seed=0)
+        calculator = get_calculator(self.game)
+        self.game.board = calculator.get_initial_board()
+        # The tiles not in either rack, as replay rebuilds the bag
+        self.game.bag_counts = get_letter_bag(
+            calculator.tile_frequencies, self.game.board, [list("CATSDOG"), list("EXAMPLE")]
+        ).counts
+        self.game.save()
+        self.player = GamePlayer.objects.create(
+            user=User.objects.create_user("player@example.com"), game=self.game, turn_index=0, rack=list("CATSDOG")
+        )
+        self.opponent = GamePlayer.objects.create(
+            user=User.objects.create_user("opponent@example.com"), game=self.game, turn_index=1, rack=list("EXAMPLE")
+        )
+        rebuild_statistics()
+
+    def do_turn(self, turn_data, game_player=None):
+        game_player = game_player or self.player
+        calculator = get_calculator(self.game)
+        return calculator.do_turn(calculator.validate_turn(turn_data, game_player), game_player)
+
+
+class SearchWordsViewTest(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.player.user)
+        self.url = reverse("scrabble:search_words", kwargs={"game_id": self.game.id})
+
+    def test_search(self):
+        results = self.client.get(self.url).json()["results"]
+        self.assertEqual(results[0], {"word": "OCTADS", "score": 9, "blanks": []})
+        self.assertEqual(len(self.client.get(self.url, {"limit": 2}).json()["results"]), 2)
+        self.assertEqual(self.client.get(self.url, {"rack": "C1T"}).status_code, 400)
+
+    def test_no_index(self):
+        with mock.patch.object(registry, "get_index", return_value=None), self.assertLogs("django.request"):
+            self.assertEqual(self.client.get(self.url).status_code, 503)
+
+
+class TurnQueryCountTest(GameTestCase):
+    """
+    A turn loads the game's players once, then saves the game, the changed players, the new turns and the players'
+    statistics with one query each
+    """
+
+    def do_turn(self, turn_data, num_queries=4):
+        calculator = get_calculator(self.game)
+        cleaned_turn_data = calculator.validate_turn(turn_data, self.player)
+        with self.assertNumQueries(num_queries):
+            return calculator.do_turn(cleaned_turn_data, self.player)
+
+    def test_play(self):
+        turn = self.do_turn({"action": TurnAction.play, "played_tiles": CAT}, num_queries=5)
+        self.game.refresh_from_db()
+        self.player.refresh_from_db()
+        self.assertEqual(turn.turn_words, ["CAT"])
+        self.assertEqual(self.game.turn_count, 1)
+        self.assertEqual(self.game.next_turn_index, 1)
+        self.assertEqual(self.game.board[7][6:9], ["C", "A", "T"])
+        self.assertEqual(self.player.score, turn.score)
+        self.assertEqual(len(self.player.rack), 7)
+        self.assertTrue(GameTurn.objects.filter(id=turn.id, turn_count=1).exists())
+        self.assertEqual(self.game.last_activity_at, self.game.updated_on)
+
+    def test_exchange(self):
+        self.do_turn({"action": TurnAction.exchange, "exchanged_tiles": ["C", "A"]})
+        self.player.refresh_from_db()
+        self.assertEqual(len(self.player.rack), 7)
+        self.assertEqual(self.game.turn_count, 1)
+
+    def test_pass(self):
+        self.do_turn({"action": TurnAction.pass_turn})
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.next_turn_index, 1)
+
+    def test_pass_with_empty_bag(self):
+        # Checking whether every player has passed needs the previous turns
+        GameTurn.objects.create(
+            game_player=self.opponent, turn_count=1, turn_action=TurnAction.exchange, score=0, rack_before_turn=[]
+        )
+        self.game.turn_count = 1
+        self.game.bag_counts = [0] * len(self.game.bag_counts)
+        self.do_turn({"action": TurnAction.pass_turn}, num_queries=5)
+        self.assertFalse(self.game.over)
+
+    def test_go_out(self):
+        self.game.bag_counts = [0] * len(self.game.bag_counts)
+        self.player.rack = list("CAT")
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT}, num_queries=5)
+        self.game.refresh_from_db()
+        self.player.refresh_from_db()
+        self.opponent.refresh_from_db()
+        self.assertTrue(self.game.over)
+        self.assertEqual(self.game.turn_count, 3)
+        self.assertEqual(
+            list(self.game.all_turns().values_list("turn_count", "turn_action")),
+            [(1, TurnAction.play), (2, TurnAction.end_game), (3, TurnAction.end_game)],
+        )
+        self.assertTrue(self.player.winner)
+        self.assertFalse(self.opponent.winner)
+
+    def test_concurrent_turn(self):
+        stale_game = ScrabbleGame.objects.get(id=self.game.id)
+        self.do_turn({"action": TurnAction.pass_turn})
+        stale_player = GamePlayer.objects.get(id=self.player.id)
+        with self.assertRaises(ValidationError):
+            get_calculator(stale_game).do_turn({"action": TurnAction.pass_turn}, stale_player)
+        self.assertEqual(self.game.all_turns().count(), 1)
+
+
+class IdempotentTurnTest(GameTestCase):
+    def test_retried_turn(self):
+        self.client.force_login(self.player.user)
+        url = reverse("scrabble:post_play", kwargs={"game_id": self.game.id})
+        for _ in range(2):
+            response = self.client.post(
+                url, {"action": TurnAction.pass_turn}, content_type="application/json", HTTP_IDEMPOTENCY_KEY="key"
+            )
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.game.all_turns().count(), 1)
+
+
+class ReplayTest(GameTestCase):
+    def get_snapshot(self):
+        """Returns the saved board, scores, racks and letter bag"""
+        players = [self.player, self.opponent]
+        for model in [self.game, *players]:
+            model.refresh_from_db()
+        return (
+            copy.deepcopy(self.game.board), [player.score for player in players],
+            [list(player.rack) for player in players], list(self.game.bag_counts),
+        )
+
+    def play_turns(self):
+        """Plays 11 turns, returning the game after each turn count from 0"""
+        snapshots = [self.get_snapshot()]
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        snapshots.append(self.get_snapshot())
+        self.do_turn({"action": TurnAction.play, "played_tiles": [{"tile": "X", "x": 7, "y": 8}]}, self.opponent)
+        snapshots.append(self.get_snapshot())
+        for game_player in [self.player, self.opponent] * 4 + [self.player]:
+            self.do_turn({"action": TurnAction.exchange, "exchanged_tiles": game_player.rack[:2]}, game_player)
+            snapshots.append(self.get_snapshot())
+        return snapshots
+
+    def test_state(self):
+        snapshots = self.play_turns()
+        self.assertEqual(list(self.game.checkpoints.values_list("turn_count", flat=True)), [10])
+        replayer = GameReplayer(get_calculator(self.game))
+        for turn_count, (board, scores, racks, bag_counts) in enumerate(snapshots):
+            state = replayer.get_state(turn_count)
+            self.assertEqual(state.turn_count, turn_count)
+            self.assertEqual((state.board, state.scores, state.racks), (board, scores, racks), turn_count)
+            self.assertEqual(state.letter_bag.counts, bag_counts, turn_count)
+
+    def test_undo(self):
+        snapshots = self.play_turns()
+        for game_player in [self.player, self.opponent, self.player]:
+            get_calculator(self.game).undo_last_turn(game_player)
+            snapshots.pop()
+            self.assertEqual(self.get_snapshot(), snapshots[-1])
+        # The checkpoint at turn 10 included an undone turn
+        self.assertFalse(self.game.checkpoints.exists())
+        self.assertEqual(self.game.next_turn_index, 0)
+
+    def test_history(self):
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        self.client.force_login(self.player.user)
+        url = reverse("scrabble:get_game_history", kwargs={"game_id": self.game.id})
+        history = self.client.get(url, {"turn": 0}).json()
+        self.assertEqual((history["turn"], history["scores"], history["rack"]), (0, [0, 0], list("CATSDOG")))
+        history = self.client.get(url).json()
+        self.assertEqual((history["turn"], history["scores"], history["board"][7][6:9]), (1, [10, 0], ["C", "A", "T"]))
+
+
+class LetterBagTest(GameTestCase):
+    def test_undo_repeats_draws(self):
+        for turn_data in [
+            {"action": TurnAction.play, "played_tiles": CAT},
+            {"action": TurnAction.exchange, "exchanged_tiles": ["C", "A"]},
+        ]:
+            bag_counts = list(self.game.bag_counts)
+            self.do_turn(turn_data)
+            drawn_rack = list(self.player.rack)
+            get_calculator(self.game).undo_last_turn(self.player)
+            self.assertEqual(self.player.rack, list("CATSDOG"))
+            self.assertEqual(self.game.bag_counts, bag_counts)
+            self.assertEqual(self.game.tiles_drawn, 0)
+            self.do_turn(turn_data)
+            self.assertEqual(self.player.rack, drawn_rack)
+            get_calculator(self.game).undo_last_turn(self.player)
+
+    def test_draw(self):
+        bag = LetterBag.from_frequencies({"A": 2, "B": 1})
+        self.assertEqual(len(bag), 3)
+        tiles = bag.draw(2, random.Random(0))
+        self.assertEqual(len(bag), 1)
+        bag.add(tiles)
+        self.assertEqual(sorted(bag.draw(5, random.Random(0))), ["A", "A", "B"])
+
+
+class BlankTileTest(GameTestCase):
+    def test_play(self):
+        self.game.selected_dictionaries = [Dictionary.ospd4]
+        self.player.rack = list("C-TSDOG")
+        turn = self.do_turn({"action": TurnAction.play, "played_tiles": [
+            {"tile": "C", "x": 6, "y": 7}, {"tile": "-", "x": 7, "y": 7}, {"tile": "T", "x": 8, "y": 7}
+        ]})
+        self.assertEqual(turn.turn_words, ["CAT"])
+        self.assertEqual(self.game.board[7][6:9], ["C", "-A", "T"])
+
+
+class BoardIndexTest(GameTestCase):
+    def assertIndexMatchesBoard(self):
+        dictionaries = self.game.get_dictionaries()
+        self.assertEqual(self.game.board_index, BoardIndex.build(self.game.board, dictionaries).to_json())
+
+    def test_updates(self):
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        self.assertIndexMatchesBoard()
+        board_index = BoardIndex.from_json(self.game.board_index, self.game.get_dictionaries())
+        self.assertTrue(board_index.is_anchor(self.game.board, 7, 8))
+        self.assertFalse(board_index.is_anchor(self.game.board, 7, 7))
+        # Below the A, only letters making a word with it, e.g. AX but not AQ
+        mask = board_index.cross_checks[HORIZONTAL][8][7]
+        self.assertTrue(mask & LETTER_BITS["x"])
+        self.assertFalse(mask & LETTER_BITS["q"])
+        self.assertIsNone(board_index.cross_checks[HORIZONTAL][0][0])
+
+        self.do_turn({"action": TurnAction.play, "played_tiles": [{"tile": "X", "x": 7, "y": 8}]}, self.opponent)
+        self.assertIndexMatchesBoard()
+        get_calculator(self.game).undo_last_turn(self.opponent)
+        self.assertIndexMatchesBoard()
+
+    def test_other_dictionaries(self):
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        self.assertIsNone(BoardIndex.from_json(self.game.board_index, [Dictionary.ospd4]))
+
+
+class ScorePlaysTest(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.player.user)
+        self.url = reverse("scrabble:score_plays", kwargs={"game_id": self.game.id})
+
+    def post(self, data):
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_preview(self):
+        response = self.post({"plays": [
+            CAT,
+            [{"tile": "C", "x": 7, "y": 7}, {"tile": "T", "x": 8, "y": 7}],
+            [{"tile": "Q", "x": 7, "y": 7}, {"tile": "A", "x": 8, "y": 7}],
+            [{"tile": "C", "x": 7}],
+        ]})
+        results = response.json()["results"]
+        self.assertEqual(results[0], {"points": 10, "words": ["CAT"], "invalidWords": []})
+        self.assertEqual(results[1], {"points": 8, "words": ["CT"], "invalidWords": ["CT"]})
+        self.assertEqual(results[2], {"error": "Invalid tile, not in rack"})
+        self.assertIn("Misformatted data", results[3]["error"])
+        # Nothing is played
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.board[7][7], "")
+
+    def test_invalid_request(self):
+        with self.assertLogs("django.request", "WARNING"):
+            self.assertEqual(self.post({"plays": []}).status_code, 400)
+            self.assertEqual(self.post({"plays": [CAT] * 101}).status_code, 400)
+            self.assertEqual(self.post([CAT]).status_code, 400)
+            self.assertEqual(self.post("{").status_code, 400)
+
+
+class LetterBagMigrationTest(TransactionTestCase):
+    before = [("scrabble", "0015_gamecheckpoint")]
+    after = [("scrabble", "0016_letter_bag_counts")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_migration(self):
+        apps = self.migrate(self.before)
+        game_id = apps.get_model("scrabble", "ScrabbleGame").objects.create(
+            game_type=WordGame.scrabble, board=[], letter_bag=list("QAZA-A")
+        ).id
+        apps = self.migrate(self.after)
+        game = apps.get_model("scrabble", "ScrabbleGame").objects.get(id=game_id)
+        self.assertEqual(game.bag_counts, LetterBag.from_tiles(list("AAA-QZ")).counts)
+        self.assertEqual(game.tiles_drawn, 0)
+
+        apps = self.migrate(self.before)
+        game = apps.get_model("scrabble", "ScrabbleGame").objects.get(id=game_id)
+        self.assertEqual(game.letter_bag, list("AAAQZ-"))
+
+
+class InProgressGamesTest(GameTestCase):
+    def test_ordered_by_activity(self):
+        other_game = ScrabbleGame.objects.create(game_type=WordGame.scrabble, board=self.game.board, bag_counts=[])
+        GamePlayer.objects.create(user=self.player.user, game=other_game, turn_index=0, rack=[])
+        self.assertEqual([rack.game for rack in self.player.user.in_progress_games()], [other_game, self.game])
+        self.do_turn({"action": TurnAction.pass_turn})
+        self.assertEqual([rack.game for rack in self.player.user.in_progress_games()], [self.game, other_game])
+        ScrabbleGame.objects.filter(id=self.game.id).update(over=True)
+        self.assertEqual([rack.game for rack in self.player.user.in_progress_games()], [other_game])
+
+
+class StatisticsTest(GameTestCase):
+    def get_statistics(self):
+        return list(UserStatistics.objects.order_by("user__email").values(
+            "play_count", "play_score_sum", "play_score_max", "longest_word",
+            "games_played", "games_won", "game_score_sum", "game_score_max",
+        ))
+
+    def test_game(self):
+        self.game.bag_counts = [0] * len(self.game.bag_counts)
+        self.player.rack = list("CAT")
+        turn = self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        opponent_statistics, player_statistics = self.get_statistics()
+        self.player.refresh_from_db()
+        self.assertEqual(player_statistics, {
+            "play_count": 1, "play_score_sum": turn.score, "play_score_max": turn.score, "longest_word": "CAT",
+            "games_played": 1, "games_won": 1, "game_score_sum": self.player.score,
+            "game_score_max": self.player.score,
+        })
+        self.assertEqual((opponent_statistics["games_played"], opponent_statistics["games_won"]), (1, 0))
+        # Incremental updates match a rebuild from the turns
+        rebuild_statistics()
+        self.assertEqual(self.get_statistics(), [opponent_statistics, player_statistics])
+        archive_game(self.player)
+        self.assertEqual(self.get_statistics()[1]["play_count"], 0)
+
+    def test_undo(self):
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        get_calculator(self.game).undo_last_turn(self.player)
+        statistics = self.get_statistics()[1]
+        self.assertEqual((statistics["play_count"], statistics["play_score_max"], statistics["longest_word"]),
+                         (0, None, ""))
+
+
+class ScorecardTest(GameTestCase):
+    def test_one_query(self):
+        self.assertEqual(self.game.get_scorecard_rows(), [])
+        turn = self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        self.do_turn({"action": TurnAction.pass_turn}, self.opponent)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.game.get_scorecard_rows(), [[(turn.score, turn.score), (0, "--")]])
+        # Cached until the game's version changes
+        with self.assertNumQueries(0):
+            self.game.get_scorecard_rows()
+
+
+class PlayerDisplayTest(GameTestCase):
+    def test_cached(self):
+        self.player.user.update(first_name="Sam")
+        self.opponent.user.update(first_name="Sally")
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                self.game.get_player_display(),
+                [{"name": "Sam", "initial": "sam"}, {"name": "Sally", "initial": "sal"}],
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(self.opponent.get_player_initial(), "sal")
+        # A name change is shown straight away
+        self.opponent.user.update(first_name="Bob")
+        self.assertEqual(self.opponent.get_player_initial(), "b")
+
+    def test_unique_prefix(self):
+        self.assertEqual(get_unique_prefix("Sam", ["Sally"]), "Sam")
+        self.assertEqual(get_unique_prefix("Al", ["Alice"]), "Al")
+        self.assertEqual(get_unique_prefix("Bob", ["Sally"]), "B")
+
+
+class GameStreamTest(GameTestCase):
+    async def test_stream(self):
+        await sync_to_async(self.async_client.force_login)(self.opponent.user)
+        url = reverse("scrabble:game_stream", kwargs={"game_id": self.game.id})
+        response = await self.async_client.get(url, {"version": self.game.version})
+        events = aiter(response.streaming_content)
+        # Start listening before the turn
+        next_event = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.1)
+
+        def play():
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+
+        turn = await sync_to_async(play)()
+        event = (await next_event).decode()
+        self.assertTrue(event.startswith("event: delta\nid: 1\n"))
+        delta = json.loads(event.split("data: ")[1])
+        self.assertEqual(delta["squares"], [[6, 7, "C"], [7, 7, "A"], [8, 7, "T"]])
+        self.assertEqual(delta["scores"], [turn.score, 0])
+        self.assertEqual(delta["next_turn_index"], 1)
+        await events.aclose()
+
+        # A page rendered before the turn reloads
+        response = await self.async_client.get(url, {"version": 0})
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b"event: reload\n"))
+        await events.aclose()
+
+
+class ConditionalGetTest(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.opponent.user)
+
+    def test_turn_index(self):
+        url = reverse("scrabble:get_game_turn", kwargs={"game_id": self.game.id})
+        etag = self.client.get(url)["ETag"]
+        # Session, user and the game's version
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.do_turn({"action": TurnAction.pass_turn})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"turn_index": 1})
+
+    def test_game_page(self):
+        url = reverse("scrabble:play_game", kwargs={"game_id": self.game.id})
+        # Session, user, reading the game's notifications and the versions
+        with self.assertNumQueries(4):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 304)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"0-'))
+
+        # Opening the game reads its notification, leaving the navbar as it was
+        create_notification(self.opponent.user, NotificationType.play, "Your turn", url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*")["ETag"], etag)
+        self.assertFalse(self.opponent.user.unread_notifications().exists())
+        # A notification from elsewhere changes the navbar
+        create_notification(self.opponent.user, NotificationType.play, "Other game", "/other")
+        self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*")["ETag"], etag)
+        # So does the user's name
+        self.opponent.user.notifications.update(read=True)
+        self.opponent.user.update(first_name="Sally")
+        self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*")["ETag"], etag)
+        self.client.logout()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*").status_code, 302)
+
+
+class GameStateTest(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.player.user)
+        self.url = reverse("scrabble:get_game_state", kwargs={"game_id": self.game.id})
+
+    def test_state(self):
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        state = self.client.get(self.url).json()
+        self.assertTrue(state["full"])
+        self.assertEqual(state["version"], 1)
+        self.assertEqual(state["squares"], [[6, 7, "C"], [7, 7, "A"], [8, 7, "T"]])
+        self.assertEqual([turn["tiles"] for turn in state["turns"]], [[[6, 7, "C"], [7, 7, "A"], [8, 7, "T"]]])
+        self.player.refresh_from_db()
+        self.assertEqual(state["rack"], self.player.rack)
+
+        # Only the opponent's pass is new
+        self.do_turn({"action": TurnAction.pass_turn}, self.opponent)
+        state = self.client.get(self.url, {"since": 1}).json()
+        self.assertFalse(state["full"])
+        self.assertEqual(state["squares"], [])
+        self.assertEqual([turn["action"] for turn in state["turns"]], [TurnAction.pass_turn])
+
+        # Undoing the pass removes its turn
+        get_calculator(self.game).undo_last_turn(self.opponent)
+        state = self.client.get(self.url, {"since": 2}).json()
+        self.assertEqual(state["version"], 3)
+        self.assertEqual((state["turns"], state["undone"]), ([], [2]))
+
+        self.assertEqual(self.client.get(self.url, {"since": "x"}).status_code, 400)
+
+
+class ScrabbleMoveGeneratorTest(GameTestCase):
+    def setUp(self):
+        super().setUp()
+        self.do_turn({"action": TurnAction.play, "played_tiles": CAT})
+        self.generator = ScrabbleMoveGenerator(self.game.board, [Dictionary.ospd4])
+
+    def test_scores(self):
+        calculator = get_calculator(self.game)
+        for move in self.generator.generate(list("AE-RS"), limit=None):
+            self.assertEqual(calculator.calculate_points(move["tiles"]), (move["points"], move["words"]))
+
+    def test_blank_for_rack_letter(self):
+        plays = {
+            frozenset((tile["x"], tile["y"], tile["tile"]) for tile in move["tiles"])
+            for move in self.generator.generate(["A", "-"], limit=None)
+        }
+        # The blank and the tile take either square of a play of two As
+        swapped = [
+            play for play in plays if {tile for _, _, tile in play} == {"A", "-A"}
+            and frozenset((x, y, "-A" if tile == "A" else "A") for x, y, tile in play) in plays
+        ]
+        self.assertTrue(swapped)
+
+    def test_board_letters(self):
+        plays = {
+            tuple((tile["tile"], tile["x"], tile["y"]) for tile in move["tiles"]): move["words"]
+            for move in self.generator.generate(list("SS"), limit=None)
+        }
+        # Plays before CAT take it in, on its own and with tiles after it
+        self.assertEqual(plays[(("S", 5, 7),)], ["SCAT"])
+        self.assertEqual(plays[(("S", 5, 7), ("S", 9, 7))], ["SCATS"])
+
+    def test_limit(self):
+        points = [move["points"] for move in self.generator.generate(list("AEIRST-"), limit=None)]
+        self.assertEqual([move["points"] for move in self.generator.generate(list("AEIRST-"))], points[:10])
+
+
+class UpwordsMoveGeneratorTest(TestCase):
+    def setUp(self):
+        self.game = ScrabbleGame(game_type=WordGame.upwords)
+        self.calculator = get_calculator(self.game)
+        self.game.board = self.calculator.get_initial_board()
+        self.game.board[4][3:6] = ["C", "A", "T"]
+        self.moves = UpwordsMoveGenerator(self.game.board, [Dictionary.ospd4]).generate(list("ODEQS"), limit=None)
+
+    def test_scores(self):
+        for move in self.moves:
+            self.assertEqual(self.calculator.calculate_points(move["tiles"]), (move["points"], move["words"]))
+            self.assertTrue(all(validate_word(word, [Dictionary.ospd4]) for word in move["words"]), move)
+
+    def test_plays(self):
+        plays = {
+            tuple((tile["tile"], tile["x"], tile["y"]) for tile in move["tiles"]): move["words"] for move in self.moves
+        }
+        # The Q tile is played as Qu, and S stacked on the C of CAT
+        self.assertEqual(plays[(("Q", 2, 1), ("O", 2, 2), ("D", 2, 3), ("S", 2, 4))], ["QUODS", "SCAT"])
+        self.assertEqual(plays[(("D", 3, 1), ("O", 3, 2), ("E", 3, 3), ("S", 3, 4))], ["DOES", "SAT"])
+
+    def test_limit(self):
+        moves = UpwordsMoveGenerator(self.game.board, [Dictionary.ospd4]).generate(list("ODEQS"))
+        self.assertEqual([move["points"] for move in moves], [move["points"] for move in self.moves[:10]])
+
+
+class GameBoardTest(TestCase):
+    def setUp(self):
+        self.board = [[""] * 15 for _ in range(15)]
+        self.game_board = GameBoard(self.board)
+        self.game_board.update_board(CAT)
+
+    def test_tiles(self):
+        self.assertEqual(self.board[7][6:9], ["C", "A", "T"])
+        self.assertFalse(self.game_board.is_first_play())
+        self.assertFalse(self.game_board.is_free_square(7, 7))
+        self.assertTrue(self.game_board.has_adjacent_tile(7, 6))
+        self.assertFalse(self.game_board.has_adjacent_tile(7, 5))
+        # Stacked tiles are kept most recent first
+        self.game_board.set_tile("B", 7, 7)
+        self.assertEqual(self.game_board.get_tile(7, 7), "BA")
+        self.assertEqual(self.game_board.get_tile(7, 7, most_recent=True), "B")
+        self.game_board.set_tile("A", 7, 7, replace=True)
+        self.assertEqual(self.board[7][7], "A")
+
+    def test_lines(self):
+        row, column = self.game_board.row(7), self.game_board.column(8)
+        self.assertEqual((len(row), row[6], column[7], column[8]), (15, "C", "T", ""))
+        self.assertEqual((row.coordinates(8), column.coordinates(7)), ((8, 7), (8, 7)))
+        line, positions = self.game_board.get_line([{"tile": "X", "x": 7, "y": 8}, {"tile": "E", "x": 7, "y": 6}])
+        self.assertEqual((line[7], positions), ("A", [8, 6]))
+        line, positions = self.game_board.get_line([{"tile": "S", "x": 9, "y": 7}])
+        self.assertEqual((line.coordinates(0), positions), ((0, 7), [9]))
+
+
+class GameEngineTest(TestCase):
+    def setUp(self):
+        self.engine = get_engine(SCRABBLE)
+        self.board = [[""] * 15 for _ in range(15)]
+
+    def test_points(self):
+        self.assertEqual(self.engine.calculate_points(self.board, CAT), (10, ["CAT"]))
+        self.board[7][6:9] = ["C", "A", "T"]
+        board = copy.deepcopy(self.board)
+        self.assertEqual(self.engine.calculate_points(self.board, [{"tile": "X", "x": 7, "y": 8}]), (9, ["AX"]))
+        self.assertEqual(self.engine.calculate_points(self.board, [
+            {"tile": "S", "x": 9, "y": 7}, {"tile": "O", "x": 9, "y": 8}
+        ]), (8, ["SO", "CATS"]))
+        self.assertEqual(self.board, board)
+
+    def test_invalid_plays(self):
+        for rack, played_tiles, error in [
+            ("CAT", [{"tile": "C", "x": 7, "y": 7}, {"tile": "Q", "x": 8, "y": 7}], "Invalid tile, not in rack"),
+            (
+                "CAT", [{"tile": "C", "x": 0, "y": 0}, {"tile": "A", "x": 1, "y": 0}],
+                "First play must include center tile"
+            ),
+            ("CAT", [{"tile": "C", "x": 7, "y": 7}], "First play must use at least 2 tiles"),
+        ]:
+            with self.assertRaisesMessage(PlayError, error):
+                self.engine.validate_play(self.board, list(rack), played_tiles)
+        self.board[7][6:9] = ["C", "A", "T"]
+        for played_tiles, error in [
+            ([{"tile": "X", "x": 0, "y": 0}], "Disconnected play"),
+            ([{"tile": "X", "x": 7, "y": 8}, {"tile": "E", "x": 7, "y": 8}], "Play includes a square twice"),
+            ([{"tile": "X", "x": 7, "y": 8}, {"tile": "E", "x": 8, "y": 9}], "Play not in line"),
+            ([{"tile": "X", "x": 7, "y": 8}, {"tile": "E", "x": 7, "y": 10}], "Play not contiguous"),
+            ([{"tile": "X", "x": 7, "y": 7}], "Play includes non-empty square"),
+        ]:
+            with self.assertRaisesMessage(PlayError, error):
+                self.engine.validate_play(self.board, list("XE"), played_tiles)
+
+    def test_upwords(self):
+        engine = get_engine(UPWORDS)
+        self.assertIs(get_engine(UPWORDS), engine)
+        board = [[""] * 10 for _ in range(10)]
+        board[4][3:6] = ["C", "A", "T"]
+        # Stacked words score a point per tile, words of single tiles double
+        self.assertEqual(engine.calculate_points(board, [{"tile": "B", "x": 3, "y": 4}]), (4, ["BAT"]))
+        self.assertEqual(engine.calculate_points(board, [{"tile": "S", "x": 6, "y": 4}]), (8, ["CATS"]))
+        with self.assertRaisesMessage(PlayError, "Play covers entire word"):
+            engine.validate_play(board, list("BOG"), [
+                {"tile": "B", "x": 3, "y": 4}, {"tile": "O", "x": 4, "y": 4}, {"tile": "G", "x": 5, "y": 4}
+            ])
+        with self.assertRaisesMessage(PlayError, "Duplicated tile"):
+            engine.validate_play(board, ["C"], [{"tile": "C", "x": 3, "y": 4}])
+        board[4][3] = "BCDEF"
+        with self.assertRaisesMessage(PlayError, "Stack is over 5 high"):
+            engine.validate_play(board, ["G"], [{"tile": "G", "x": 3, "y": 4}])
@@ -9,9 +9,15 @@ urlpatterns = [
     path("play/<uuid:game_id>", views.GameView.as_view(), name="play_game"),
     path("play/<uuid:game_id>/post/", views.GameTurnView.as_view(), name="post_play"),
     path("play/<uuid:game_id>/score/", views.CalculateScoreView.as_view(), name="score_play"),
+    path("play/<uuid:game_id>/scores/", views.CalculateScoresView.as_view(), name="score_plays"),
     path("play/<uuid:game_id>/update_rack/", views.UpdateRackView.as_view(), name="update_rack"),
     path("play/<uuid:game_id>/undo/", views.UndoTurnView.as_view(), name="undo_turn"),
     path("info/<uuid:game_id>/turn", views.GameTurnIndexView.as_view(), name="get_game_turn"),
+    path("info/<uuid:game_id>/state", views.GameStateView.as_view(), name="get_game_state"),
+    path("info/<uuid:game_id>/stream", views.GameStreamView.as_view(), name="game_stream"),
+    path("info/<uuid:game_id>/history", views.GameHistoryView.as_view(), name="get_game_history"),
+    path("info/<uuid:game_id>/search", views.SearchWordsView.as_view(), name="search_words"),
+    path("info/dictionaries/", views.DictionaryStatsView.as_view(), name="dictionary_stats"),
     path("play/<uuid:game_id>/notifications/", views.ToggleNotificationsView.as_view(), name="update_game_settings"),
     path("play/<uuid:game_id>/options/", views.EditGameOptionsView.as_view(), name="edit_game_options"),
     path("play/<uuid:game_id>/archive/", views.ArchiveGameView.as_view(), name="archive_game"),
@@ -1,27 +1,38 @@
+import hashlib
 import json
+import os
 from collections import Counter
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.admin.utils import flatten
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db.models import Func, Subquery
 from django.forms import model_to_dict
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import FormView, TemplateView
 
-from common.models import User
+from common.events import format_event, get_game_channel, get_stream_response, stream_events
+from common.models import Notification, User
 from scrabble.constants import Multiplier, TurnAction, WordGame, BLANK_CHARS
-from scrabble.gameplay.scrabble_gameplay import BOARD_CONFIG, TILE_SCORES
+from scrabble.dictionaries import registry, word_cache
+from scrabble.engine.constants import BOARD_CONFIG, TILE_SCORES
 from scrabble.forms import CreateGameForm, EditGameForm
+from scrabble.gameplay.replay import GameReplayer
+from scrabble.gameplay.state import get_game_state
 from scrabble.helpers import create_new_game, get_calculator, send_turn_notification, archive_game, \
     send_game_over_notification, start_game
 from scrabble.models import ScrabbleGame, GamePlayer
+from scrabble.search import MAX_LIMIT, SearchUnavailableError, search_words
 
 
 class CreateGameView(LoginRequiredMixin, FormView):
@@ -65,19 +76,65 @@ class GamePermissionMixin(UserPassesTestMixin):
         return super().handle_no_permission()
 
 
+def get_game_versions(request, game_id, **annotations):
+    """
+    Returns (game version, game updated_on, player id, player updated_on) of the user's player in the game, followed
+    by the values of any annotations, with one query, or None if the user can't see the game
+    """
+    if not request.user.is_authenticated:
+        return None
+    return GamePlayer.objects.filter(
+        game_id=game_id, user_id=request.user.id, game__archived_on__isnull=True
+    ).annotate(**annotations).values_list("game__version", "game__updated_on", "id", "updated_on", *annotations).first()
+
+
+def get_game_etag(request, game_id):
+    if not request.user.is_authenticated:
+        return None
+    # Opening the game reads its notifications, even when the page is served from the browser's cache
+    request.user.notifications.filter(view_url=request.path, read=False).update(read=True)
+    # Messages are shown once, so a page with messages can't be served from the browser's cache
+    if messages.get_messages(request):
+        return None
+    unread = Notification.objects.filter(user_id=request.user.id, read=False).order_by()
+    versions = get_game_versions(
+        request,
+        game_id,
+        # Players' names
+        users_updated_on=Subquery(
+            User.objects.filter(game_racks__game_id=game_id).order_by("-updated_on").values("updated_on")[:1]
+        ),
+        # The navbar's notification count and latest notifications
+        unread_count=Subquery(unread.annotate(count=Func("id", function="COUNT")).values("count")),
+        latest_unread=Subquery(unread.order_by("-created_on").values("created_on")[:1]),
+    )
+    if versions is None:
+        return None
+    version, *other_versions = versions
+    # The page also shows the game's options, the player's rack and settings, the user's name in the navbar, and
+    # includes the CSRF token
+    key = ":".join(
+        str(value) for value in [*other_versions, request.user.get_short_name(), request.META.get("CSRF_COOKIE", "")]
+    )
+    return f"{version}-{hashlib.sha256(key.encode()).hexdigest()[:16]}"
+
+
+def get_turn_index_etag(request, game_id):
+    versions = get_game_versions(request, game_id)
+    return str(versions[0]) if versions else None
+
+
+# Answer unchanged pages with 304 before the permission checks load the game
+@method_decorator([cache_control(private=True, no_cache=True), condition(etag_func=get_game_etag)], name="dispatch")
 class GameView(GamePermissionMixin, TemplateView):
     template_name = "scrabble/word_game.html"
 
-    def get(self, *args, **kwargs):
-        self.request.user.notifications.filter(view_url=self.request.path).update(read=True)
-        return super().get(*args, **kwargs)
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         in_turn = self.game_player.turn_index == self.game.next_turn_index and not self.game.over
         last_turn = self.game.all_turns().last()
         can_undo = last_turn.game_player == self.game_player if last_turn else False
-        remaining_letters = self.game.letter_bag + flatten(
+        remaining_letters = self.game.letter_bag.tiles() + flatten(
             self.game.racks.exclude(user=self.request.user).values_list('rack', flat=True)
         )
         remaining_letters = [l if l.isalpha() else '*' for l in remaining_letters] # Make blanks the same
@@ -122,25 +179,35 @@ class EditGameOptionsView(GamePermissionMixin, FormView):
 class GameTurnView(GamePermissionMixin, View):
     def post(self, request, *args, **kwargs):
         turn_data = json.loads(request.body.decode())
+        idempotency_key = request.headers.get("Idempotency-Key") or None
+        if idempotency_key and len(idempotency_key) > 64:
+            return JsonResponse(status=400, data={"error": "Invalid idempotency key"})
+        if self.is_processed(idempotency_key):
+            return redirect('scrabble:play_game', game_id=self.game.id)
         calculator = get_calculator(self.game)
-        with transaction.atomic():
-            try:
-                cleaned_turn_data = calculator.validate_turn(turn_data, self.game_player)
-                turn = calculator.do_turn(cleaned_turn_data, self.game_player)
-            except ValidationError as e:
-                return JsonResponse(status=400, data={"error": e.message})
-            if turn.turn_action == TurnAction.play:
-                success_message = f"You played {', '.join(turn.turn_words)} for {turn.score} points."
-            else:
-                success_message = "Your turn is complete."
-            messages.success(request, success_message)
-        self.game.refresh_from_db()
+        try:
+            cleaned_turn_data = calculator.validate_turn(turn_data, self.game_player)
+            turn = calculator.do_turn(cleaned_turn_data, self.game_player, idempotency_key=idempotency_key)
+        except ValidationError as e:
+            # A concurrent submission of the same turn may have been played first
+            if self.is_processed(idempotency_key):
+                return redirect('scrabble:play_game', game_id=self.game.id)
+            return JsonResponse(status=400, data={"error": e.message})
+        if turn.turn_action == TurnAction.play:
+            success_message = f"You played {', '.join(turn.turn_words)} for {turn.score} points."
+        else:
+            success_message = "Your turn is complete."
+        messages.success(request, success_message)
         if not self.game.over:
             send_turn_notification(self.game, request)
         else:
             send_game_over_notification(self.game, request)
         return redirect('scrabble:play_game', game_id=self.game.id)
 
+    def is_processed(self, idempotency_key):
+        """Returns True if a turn was already played with this key, e.g. by a retried request"""
+        return bool(idempotency_key) and self.game_player.turns.filter(idempotency_key=idempotency_key).exists()
+
 
 class CalculateScoreView(GamePermissionMixin, View):
     def post(self, request, *args, **kwargs):
@@ -157,11 +224,107 @@ class CalculateScoreView(GamePermissionMixin, View):
         return JsonResponse(data={"points": points, "words": words, "invalidWords": invalid_words})
 
 
+class CalculateScoresView(GamePermissionMixin, View):
+    max_plays = 100
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body.decode())
+        except json.JSONDecodeError:
+            data = None
+        plays = data.get("plays") if isinstance(data, dict) else None
+        if not isinstance(plays, list) or not plays:
+            return JsonResponse(status=400, data={"error": "Must include a list of plays"})
+        if len(plays) > self.max_plays:
+            return JsonResponse(status=400, data={"error": f"At most {self.max_plays} plays can be scored at once"})
+        calculator = get_calculator(self.game)
+        return JsonResponse(data={"results": calculator.preview_plays(plays, self.game_player)})
+
+
+@method_decorator(
+    [cache_control(private=True, no_cache=True), condition(etag_func=get_turn_index_etag)], name="dispatch"
+)
 class GameTurnIndexView(GamePermissionMixin, View):
     def get(self, request, *args, **kwargs):
         return JsonResponse(data={'turn_index': self.game.next_turn_index})
 
 
+class GameStreamView(GamePermissionMixin, View):
+    """
+    Streams the changes of each turn and undo of the game as server-sent events, see GameContext.get_delta.
+    Sends a reload event first if the game has changed since the given version, or since the last delta received
+    by a reconnecting EventSource.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # The permission check queries the database, which can't be done from async code
+        if not await sync_to_async(self.test_func)():
+            return await sync_to_async(self.handle_no_permission)()
+        return await View.dispatch(self, request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        version = request.headers.get("Last-Event-ID") or request.GET.get("version")
+
+        def format_delta(delta):
+            return format_event(delta, event_id=delta["version"], event="delta")
+
+        def get_missed():
+            self.game.refresh_from_db(fields=["version"])
+            if version is not None and version != str(self.game.version):
+                return [format_event({"version": self.game.version}, event="reload")]
+            return []
+
+        return get_stream_response(stream_events(get_game_channel(self.game.id), format_delta, get_missed))
+
+
+class GameHistoryView(GamePermissionMixin, View):
+    def get(self, request, *args, **kwargs):
+        turn = request.GET.get("turn")
+        try:
+            turn_count = int(turn) if turn else None
+        except ValueError:
+            return JsonResponse(status=400, data={"error": "Invalid turn"})
+        state = GameReplayer(get_calculator(self.game)).get_state(turn_count)
+        return JsonResponse(data={
+            "turn": state.turn_count,
+            "board": state.board,
+            "scores": state.scores,
+            "rack": state.racks[self.game_player.turn_index],
+        })
+
+
+class GameStateView(GamePermissionMixin, View):
+    """The game's state, or with ?since=<version> only the changes since that version, see get_game_state"""
+
+    def get(self, request, *args, **kwargs):
+        since = request.GET.get("since")
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return JsonResponse(status=400, data={"error": "Invalid version"})
+        return JsonResponse(data=get_game_state(self.game, self.game_player, since))
+
+
+class SearchWordsView(GamePermissionMixin, View):
+    def get(self, request, *args, **kwargs):
+        rack = request.GET.get("rack") or "".join(self.game_player.rack)
+        try:
+            max_length = request.GET.get("max_length")
+            results = search_words(
+                rack,
+                self.game.get_dictionaries(),
+                pattern=request.GET.get("pattern"),
+                min_length=int(request.GET.get("min_length", 2)),
+                max_length=int(max_length) if max_length else None,
+                limit=min(max(int(request.GET.get("limit", 100)), 1), MAX_LIMIT),
+            )
+        except ValueError as e:
+            return JsonResponse(status=400, data={"error": str(e)})
+        except SearchUnavailableError as e:
+            return JsonResponse(status=503, data={"error": str(e)})
+        return JsonResponse(data={"results": results})
+
+
 class UpdateRackView(GamePermissionMixin, View):
     def post(self, request, *args, **kwargs):
         rack = json.loads(request.body.decode())
@@ -207,4 +370,18 @@ class StartRematchView(GamePermissionMixin, View):
         new_game = ScrabbleGame(**model_to_dict(self.game, fields=CreateGameForm.Meta.fields))
         start_game(new_game, User.objects.filter(game_racks__game=self.game), request)
         messages.success(request, "The rematch has started! Invitation emails have been issued.")
-        return redirect("scrabble:play_game", game_id=new_game.id)
\ No newline at end of file
+        return redirect("scrabble:play_game", game_id=new_game.id)
+
+
+class DictionaryStatsView(UserPassesTestMixin, View):
+    """Reports dictionary load and word cache statistics for the worker process serving the request"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(data={
+            "pid": os.getpid(),
+            "dictionaries": registry.stats(),
+            "word_cache": word_cache.stats(),
+        })
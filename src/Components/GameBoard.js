@@ -9,15 +9,16 @@ import {MULTIPLIERS, TURN_ACTION} from "../constants";
 
 const GameBoard = (props) => {
   const {
-    board,
+    board: initialBoard,
     rack,
     boardConfig,
     scoreUrl,
     turnUrl,
     updateRackUrl,
     gameId,
-    inTurn,
-    canUndo,
+    playerTurnIndex,
+    inTurn: initialInTurn,
+    canUndo: initialCanUndo,
     undoTurnUrl,
     csrfToken,
     enforceWordValidation,
@@ -31,6 +32,11 @@ const GameBoard = (props) => {
   const [wordValidationError, setWordValidationError] = useState("")
   const [processing, setProcessing] = useState(false)
   const [exchangedTiles, setExchangedTiles] = useState([])
+  const [board, setBoard] = useState(initialBoard)
+  const [inTurn, setInTurn] = useState(initialInTurn)
+  const [canUndo, setCanUndo] = useState(initialCanUndo)
+  // Sent with every submission from this page, so a repeated submission isn't played twice
+  const [idempotencyKey] = useState(() => window.crypto.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random()}`)
 
   useEffect(() => {
     const getScore = async () => {
@@ -65,6 +71,26 @@ const GameBoard = (props) => {
     getScore()
   }, [playedTiles, scoreUrl, setPoints, setValidationError]);
 
+  // Apply the turns of other players, dispatched by the game page as they happen
+  useEffect(() => {
+    const applyDelta = (event) => {
+      const delta = event.detail
+      setBoard(currentBoard => {
+        const newBoard = currentBoard.map(row => [...row])
+        delta.squares.forEach(([x, y, square]) => {newBoard[y][x] = square})
+        return newBoard
+      })
+      // Tiles can't stay where another player just played
+      setPlayedTiles(currentPlayedTiles => currentPlayedTiles.filter(
+        tile => !delta.squares.some(([x, y]) => tile.x === x && tile.y === y)
+      ))
+      setInTurn(delta.next_turn_index === playerTurnIndex)
+      setCanUndo(false)
+    }
+    window.addEventListener('game-delta', applyDelta)
+    return () => window.removeEventListener('game-delta', applyDelta)
+  }, [playerTurnIndex])
+
   const doPlay = async (action) => {
     const postData = {'action': action}
     if (action === TURN_ACTION.play) {
@@ -76,7 +102,7 @@ const GameBoard = (props) => {
     setProcessing(true)
     const resp = await fetch(turnUrl, {
       method: 'post',
-      headers: {'X-CSRFToken': window.csrfmiddlewaretoken},
+      headers: {'X-CSRFToken': window.csrfmiddlewaretoken, 'Idempotency-Key': idempotencyKey},
       body: JSON.stringify(postData)
     })
     if (resp.ok) {